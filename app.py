@@ -1,10 +1,10 @@
 import os
-from flask import Flask, render_template, request, jsonify
+import time
+import click
+from flask import Flask, Response, g, render_template, request, jsonify
 from dotenv import load_dotenv
-import requests
-import re
-from bs4 import BeautifulSoup
-from datetime import datetime
+from datetime import date, timedelta
+from typing import Optional
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,16 +14,26 @@ FEATURE_LANGUAGE_SELECTOR = os.getenv('FEATURE_LANGUAGE_SELECTOR', 'false').lowe
 FEATURE_RATINGS = os.getenv('FEATURE_RATINGS', 'false').lower() == 'true'
 
 from services.translator import (
-    translate_menu, 
+    translate_menus,
     parse_accept_language, 
     SUPPORTED_LANGUAGES,
     DEFAULT_LANGUAGE
 )
 from services.database import (
     init_db,
-    add_rating,
+    get_pool,
+    get_pool_stats,
     get_ratings_summary,
-    get_top_pick
+    get_ratings_overview,
+    iter_ratings,
+    iter_ratings_history,
+    rebuild_rollup,
+    HISTORY_COLUMNS,
+    RATING_COLUMNS
+)
+from services import (
+    admission, fragments, menu_api, menu_store, metrics, page_cache, pretranslate, rating_stream, ratings_export,
+    scrapers, snapshots, top_pick, translation_cache, vote_buffer
 )
 
 app = Flask(__name__)
@@ -35,260 +45,391 @@ RESTAURANT_IDS = {
     'Cafe Keilalahti by Compass Group': 'compass'
 }
 
-ENGLISH_WEEKDAYS = [
-    "Monday",
-    "Tuesday",
-    "Wednesday",
-    "Thursday",
-    "Friday",
-    "Saturday",
-    "Sunday",
+RESTAURANTS = [
+    {
+        'name': 'ISS FG by ISS',
+        'id': 'iss',
+        'fetch': scrapers.fetch_iss,
+        'parse': scrapers.parse_iss_week,
+    },
+    {
+        'name': 'Nest by Nest Restaurant',
+        'id': 'nest',
+        'fetch': scrapers.fetch_nest,
+        'parse': scrapers.parse_nest,
+    },
+    {
+        'name': 'Cafe Keilalahti by Compass Group',
+        'id': 'compass',
+        'fetch': scrapers.fetch_compass,
+        'parse': scrapers.parse_compass,
+    }
 ]
 
-def scrape_iss(url):
-    response = requests.get(url, timeout=10)
-    soup = BeautifulSoup(response.content, 'html.parser')
-    meals = []
-    
-    # Find the English section by looking for the h2 element with text starting with "Week"
-    english_section = soup.find('h2', class_='lunch-menu__title multiple js-lunch-menu-toggle', string=lambda t: t and t.startswith('Week'))
-    if english_section:
-        # Get the parent article of the English section
-        english_menu = english_section.find_next('article', class_='lunch-menu')
-        if english_menu:
-            current_day_index = datetime.now().weekday()
-            current_day_name = ENGLISH_WEEKDAYS[current_day_index].lower() if current_day_index < 7 else None
-            
-            if current_day_index >= 5:  # Weekend
-                return meals
-            
-            # Find the correct day section by matching day name in header
-            meal_days = english_menu.find_all('div', class_='lunch-menu__day')
-            target_day = None
-            
-            for day_div in meal_days:
-                # Look for day header (h3 or strong element containing day name)
-                day_header = day_div.find(['h3', 'strong', 'b'])
-                if day_header:
-                    header_text = day_header.get_text(strip=True).lower()
-                    if current_day_name in header_text:
-                        target_day = day_div
-                        break
-            
-            # Fallback to index-based if name matching fails
-            if not target_day and current_day_index < len(meal_days):
-                target_day = meal_days[current_day_index]
-            
-            # SPECIAL CASE: If it's Friday and we couldn't find Friday section,
-            # look for Friday data embedded in Thursday's section (data corruption recovery)
-            search_within_previous_day = False
-            if not target_day and current_day_index == 4:  # Friday
-                # Try to find Thursday's section and extract Friday from it
-                for day_div in meal_days:
-                    day_header = day_div.find(['h3', 'strong', 'b'])
-                    if day_header and 'thursday' in day_header.get_text(strip=True).lower():
-                        target_day = day_div
-                        search_within_previous_day = True
-                        break
-                # Or use index 3 (Thursday) as fallback
-                if not target_day and len(meal_days) > 3:
-                    target_day = meal_days[3]
-                    search_within_previous_day = True
-            
-            if target_day:
-                meal_items = target_day.find_all('p')
-                collecting = not search_within_previous_day  # Start collecting immediately unless searching for embedded day
-                
-                for item in meal_items:
-                    meal_text = item.get_text(strip=True)
-                    if not meal_text:
-                        continue
-                    
-                    # If searching within previous day's section for current day's data
-                    if search_within_previous_day:
-                        # Start collecting when we see current day's name
-                        if current_day_name in meal_text.lower():
-                            collecting = True
-                            continue  # Skip the day header line itself
-                        if not collecting:
-                            continue
-                    
-                    # Stop if we hit the next day's header
-                    next_day_index = current_day_index + 1
-                    if next_day_index < 5:  # There's a next weekday
-                        next_day_name = ENGLISH_WEEKDAYS[next_day_index].lower()
-                        if next_day_name in meal_text.lower():
-                            break
-                    
-                    # Also stop if we hit a different day header (general case)
-                    text_lower = meal_text.lower()
-                    is_day_header = any(day.lower() in text_lower and len(meal_text) < 20 
-                                       for day in ENGLISH_WEEKDAYS[:5])
-                    if is_day_header and current_day_name not in text_lower:
-                        if not search_within_previous_day:
-                            break
-                        continue
-
-                    if ':' in meal_text:
-                        label_raw, description_raw = meal_text.split(':', 1)
-                        label = label_raw.strip() or 'Main'
-                        description = description_raw.strip()
-                    else:
-                        label = 'Main'
-                        description = meal_text.strip()
-
-                    if not description:
-                        description = label
-
-                    meals.append({
-                        'label': label,
-                        'description': description,
-                    })
-    return meals
-
-def scrape_nest():
-    current_weekday_index = datetime.today().weekday()
-    english_weekday = ENGLISH_WEEKDAYS[current_weekday_index]
-    try:
-        response = requests.get(
-            "https://www.nest-restaurant.fi/en",
-            timeout=12,
-        )
-        response.raise_for_status()
-    except requests.RequestException:
-        return []
-
-    soup = BeautifulSoup(response.text, 'html.parser')
-    menu_container = soup.select_one('[data-hook="menu.container"]')
-    if not menu_container:
-        return []
-
-    sections = menu_container.select('[data-hook="section.container"]')
-    meals = []
-    for section in sections:
-        name_el = section.select_one('[data-hook="section.name"]')
-        if not name_el:
-            continue
-        section_name = name_el.get_text(strip=True)
-        if not section_name.startswith(english_weekday):
-            continue
-
-        for item in section.select('[data-hook="item.container"]'):
-            title_el = item.select_one('[data-hook="item.name"]')
-            if not title_el:
-                continue
-            title = title_el.get_text(strip=True)
-            description_el = item.select_one('[data-hook="item.description"]')
-            description = description_el.get_text(" ", strip=True) if description_el else ''
-            description = re.sub(r"\s+", " ", description).strip()
-
-            combined = f"{title}: {description}" if description else title
-            label, desc = (part.strip() for part in combined.split(':', 1)) if ':' in combined else (combined.strip(), '')
-            meals.append({'label': label, 'description': desc})
-        break
-
-    return meals
-
-def scrape_compass(url):
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        meals = []
-        # Find the item tag in the RSS feed
-        item = soup.find('item')
-        if item:
-            # Find the description tag within the item
-            description = item.find('description')
-            if description:
-                # Get the description content as is
-                description_content = description.get_text().strip()
-                # Remove text before "€:" using regex
-                description_content = re.sub(r'^.*?€:', '', description_content, flags=re.DOTALL).strip()
-                # Replace multiple <br> tags with a single newline
-                description_content = re.sub(r'(<br\s*/?>\s*)+', '\n', description_content)
-                # Split the description content by newlines and append each line as a separate meal entry
-                for line in description_content.split('\n'):
-                    line = line.strip()
-                    if line:
-                        meals.append({'name': line})
-        return meals
-    except requests.RequestException as e:
-        print(f"Error scraping Compass: {e}")
-        return [{'name': 'Menu temporarily unavailable'}]
+for _restaurant in RESTAURANTS:
+    menu_store.register_source(_restaurant['id'], _restaurant['fetch'], _restaurant['parse'])
 
-@app.route('/')
-def index():
-    # Get user's preferred language from header or query param
+# Translate every refreshed menu into all languages before anyone asks for them
+menu_store.add_listener(pretranslate.schedule)
+
+# Persist every successful scrape
+menu_store.add_listener(snapshots.save)
+
+# Unchanged menus re-served under a new date keep their version but not their dates
+menu_store.add_redate_listener(pretranslate.redate)
+menu_store.add_redate_listener(snapshots.save)
+
+# Buffered votes only reach the page's counts once written
+vote_buffer.add_flush_listener(page_cache.bump_ratings_version)
+
+# Push count changes (local votes and ones reconciled from other instances) to live viewers
+top_pick.add_listener(rating_stream.publish)
+
+
+def _collect_metrics():
+    """Gauges and counters read from the services' own stats on every /metrics scrape."""
+    cache = translation_cache.stats()
+    for result in ('lru_hits', 'store_hits', 'misses'):
+        yield 'translation_cache_lookups_total', 'counter', {'result': result}, cache[result]
+    yield 'translation_cache_hit_ratio', 'gauge', {}, cache['hit_rate']
+
+    db = get_pool_stats()
+    yield 'db_breaker_open', 'gauge', {}, db['breaker'] != 'closed'
+    yield 'db_breaker_trips_total', 'counter', {}, db['trips']
+    yield 'db_pool_max', 'gauge', {}, db['pool_max']
+    yield 'db_pool_open_connections', 'gauge', {}, db['open_connections']
+    yield 'db_pool_in_use', 'gauge', {}, db['in_use']
+    yield 'db_checkout_timeouts_total', 'counter', {}, db['checkout_timeouts']
+
+    pages = page_cache.stats()
+    for result in ('hits', 'misses', 'not_modified'):
+        yield 'page_cache_requests_total', 'counter', {'result': result}, pages[result]
+    for kind, counters in fragments.stats()['kinds'].items():
+        for result in ('hits', 'misses'):
+            yield 'fragment_cache_requests_total', 'counter', {'fragment': kind, 'result': result}, counters[result]
+
+    yield 'vote_buffer_pending', 'gauge', {}, vote_buffer.pending_count()
+    yield 'vote_admission_clients', 'gauge', {}, admission.stats()['clients']
+    yield 'rating_stream_clients', 'gauge', {}, rating_stream.stats()['clients']
+
+
+metrics.add_collector(_collect_metrics)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def add_server_timing(response):
+    """Report the request's stage durations in a Server-Timing header."""
+    started = g.get('request_started')
+    if started is not None and request.endpoint != 'api_metrics':
+        elapsed = time.perf_counter() - started
+        metrics.observe('http_request_seconds', elapsed, endpoint=request.endpoint or 'unknown')
+        metrics.record('total', elapsed)
+        header = metrics.server_timing_header()
+        if header:
+            response.headers['Server-Timing'] = header
+    return response
+
+
+@app.before_request
+def start_menu_refresher():
+    """Make sure the background menu refresher (and top pick reconciler) runs in this worker."""
+    menu_store.start_refresher()
+    if FEATURE_RATINGS:
+        top_pick.start()
+
+
+def restore_snapshots():
+    """
+    Serve the last known-good menus right after a restart; the refresher
+    revalidates them in the background and they stay in place while an
+    upstream is down. Runs in serving processes only (not on import), since
+    restoring schedules pre-translation jobs that a CLI command would have to
+    wait for before exiting.
+    """
+    for restaurant in RESTAURANTS:
+        snapshot = snapshots.load_latest(restaurant['id'])
+        if snapshot:
+            menu_store.restore(restaurant['id'], snapshot['days'], snapshot['fetched_at'])
+
+
+def warm_up():
+    """
+    Load today's menus and ratings before the first visitor arrives.
+    Called by gunicorn for every new worker (see gunicorn.conf.py).
+    """
+    restore_snapshots()
+    start_menu_refresher()
+    results = menu_store.ensure_fresh([restaurant['id'] for restaurant in RESTAURANTS])
+    print(f"Menu cache warmed: {results}")
+
+
+def parse_menu_date(value: str) -> date:
+    """Parse a ?date= query value (YYYY-MM-DD), falling back to today."""
+    if value:
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            pass
+    return date.today()
+
+
+def load_menus(lang: str, menu_date: date, restaurants: Optional[list] = None) -> tuple:
+    """
+    Get every restaurant's menu for a day in the requested language.
+    Uses pre-translated variants when they are ready and translates the rest
+    in one batch.
+
+    Args:
+        lang: Target language code
+        menu_date: Menu date
+        restaurants: Only load these entries of RESTAURANTS
+
+    Returns:
+        Tuple of (list of menus, whether every text is translated; False while
+        the Translator is failing, so callers don't cache the result for long)
+    """
+    if restaurants is None:
+        restaurants = RESTAURANTS
+    menus = [menu_store.get_menu(restaurant['id'], menu_date) for restaurant in restaurants]
+    if lang == DEFAULT_LANGUAGE:
+        return menus, True
+
+    untranslated = []
+    for index, restaurant in enumerate(restaurants):
+        version = menu_store.entry_version(restaurant['id'])
+        translated = pretranslate.get_menu(restaurant['id'], lang, menu_date, version)
+        if translated is None:
+            untranslated.append(index)
+        else:
+            menus[index] = translated
+
+    missed = set()
+    if untranslated:
+        with metrics.timed('translate', 'translation_seconds'):
+            translated = translate_menus([menus[index] for index in untranslated], lang, missed=missed)
+        for index, menu in zip(untranslated, translated):
+            menus[index] = menu
+    return menus, not missed
+
+
+def request_language() -> str:
+    """Get the user's preferred language from the query param or Accept-Language header."""
     lang = request.args.get('lang')
     if not lang:
         lang = parse_accept_language(request.headers.get('Accept-Language', ''))
     if lang not in SUPPORTED_LANGUAGES:
         lang = DEFAULT_LANGUAGE
+    return lang
 
-    restaurants = [
-        {
-            'name': 'ISS FG by ISS',
-            'id': 'iss',
-            'scraper': scrape_iss,
-            'url': 'https://fg.ravintolapalvelut.iss.fi/'
-        },
-        {
-            'name': 'Nest by Nest Restaurant',
-            'id': 'nest',
-            'scraper': scrape_nest,
-            'url': None
-        },
-        {
-            'name': 'Cafe Keilalahti by Compass Group',
-            'id': 'compass',
-            'scraper': scrape_compass,
-            'url': 'https://www.compass-group.fi/menuapi/feed/rss/current-day?costNumber=3283&language=en'
-        }
-    ]
 
-    menus = []
-    restaurant_names = []
-    restaurant_ids = []
-    all_ratings = {}
-    
-    for restaurant in restaurants:
-        scraper = restaurant['scraper']
-        url = restaurant.get('url')
-        menu = scraper(url) if url else scraper()
-        
-        # Translate menu if needed
-        if lang != DEFAULT_LANGUAGE:
-            menu = translate_menu(menu, lang)
-        
-        menus.append(menu)
-        restaurant_names.append(restaurant['name'])
-        restaurant_ids.append(restaurant['id'])
-        
-        # Get ratings for this restaurant
-        all_ratings[restaurant['id']] = get_ratings_summary(restaurant['id'])
-
-    # Get today's top pick
-    top_pick = get_top_pick()
-
-    current_weekday = datetime.today().strftime('%A')
-    current_date = datetime.now().strftime('%d.%m.%Y')
-
-    return render_template(
+@app.route('/')
+def index():
+    lang = request_language()
+
+    # Optional ?date=YYYY-MM-DD shows another day held by the store (e.g. the rest of the ISS week)
+    menu_date = parse_menu_date(request.args.get('date'))
+
+    # Only waits on a cold start, and never longer than the scrape deadline
+    with metrics.timed('scrape'):
+        menu_store.ensure_fresh([restaurant['id'] for restaurant in RESTAURANTS])
+
+    # Serve the cached page unless the menus, their translations or ratings changed since it was rendered
+    # (only translated pages change with new translations)
+    generation = pretranslate.generation() if lang != DEFAULT_LANGUAGE else None
+    cache_key = (lang, menu_date, menu_store.menu_version(), generation, page_cache.ratings_version())
+    page = page_cache.get(cache_key)
+    if page is None:
+        page = page_cache.put(cache_key, render_index(lang, menu_date))
+    response = page_cache.respond(page, request)
+    if FEATURE_RATINGS:
+        # Votes from this browser are then told apart from others behind the same address
+        admission.issue_voter_cookie(response, request)
+    return response
+
+
+# Filled into a card's top_badge slot for the day's top pick
+TOP_PICK_BADGE = '<span class="top-pick-badge">🏆 Top Pick</span>'
+
+
+def render_index(lang: str, menu_date: date) -> str:
+    """
+    Assemble the index page for a language and day from cached fragments
+    (see services/fragments.py): the page shell, every restaurant's menu card
+    and, for today, every restaurant's rating counts.
+    """
+    # Votes are always recorded for today, so only offer them (and read them) on today's menu
+    show_ratings = FEATURE_RATINGS and menu_date == date.today()
+    cards = load_menu_cards(lang, menu_date, show_ratings)
+
+    if show_ratings:
+        values = load_rating_slots(menu_date, top_pick.get(menu_date))
+        cards = [fragments.fill(card, values[restaurant['id']]) for card, restaurant in zip(cards, RESTAURANTS)]
+    else:
+        cards = [fragments.fill(card, {}) for card in cards]
+
+    shell = fragments.get(('shell', lang, menu_date, show_ratings), lambda: compile_template(
         'index.html',
-        menus=menus,
-        restaurant_names=restaurant_names,
-        restaurant_ids=restaurant_ids,
-        ratings=all_ratings,
-        top_pick=top_pick,
-        current_weekday=current_weekday,
-        current_date=current_date,
+        current_weekday=menu_date.strftime('%A'),
+        current_date=menu_date.strftime('%d.%m.%Y'),
+        menu_date=menu_date.isoformat(),
         current_lang=lang,
         supported_languages=SUPPORTED_LANGUAGES,
         feature_language_selector=FEATURE_LANGUAGE_SELECTOR,
-        feature_ratings=FEATURE_RATINGS,
-        zip=zip,
-    )
+        feature_ratings=show_ratings,
+    ))
+    return fragments.fill(shell, {('cards', None): ''.join(cards)})
+
+
+def compile_template(template: str, **context) -> dict:
+    """Render a template that marks its per-request values with slot() into a compiled fragment."""
+    with metrics.timed('render', 'render_seconds'):
+        return fragments.compile_slots(lambda slot: render_template(template, slot=slot, **context))
+
+
+def load_menu_cards(lang: str, menu_date: date, show_ratings: bool) -> list:
+    """
+    Get every restaurant's compiled menu card.
+    Cards are cached per menu version and translation generation; the menus
+    of all uncached cards are loaded (and translated) in one batch.
+    """
+    # Only translated cards change with new translations
+    generation = pretranslate.generation() if lang != DEFAULT_LANGUAGE else None
+    keys = [
+        ('menu', restaurant['id'], lang, menu_date, menu_store.entry_version(restaurant['id']), generation,
+         show_ratings)
+        for restaurant in RESTAURANTS
+    ]
+    cards = [fragments.lookup(key) for key in keys]
+    uncached = [restaurant for restaurant, card in zip(RESTAURANTS, cards) if card is None]
+    if not uncached:
+        return cards
+
+    menus, complete = load_menus(lang, menu_date, uncached)
+    menus = dict(zip((restaurant['id'] for restaurant in uncached), menus))
+    for index, (restaurant, key) in enumerate(zip(RESTAURANTS, keys)):
+        if cards[index] is None:
+            cards[index] = compile_template(
+                '_menu_card.html',
+                menu=menus[restaurant['id']],
+                name=restaurant['name'],
+                restaurant_id=restaurant['id'],
+                feature_ratings=show_ratings,
+            )
+            # Cards with untranslated text are only kept until translating is worth another try
+            fragments.store(key, cards[index], None if complete else fragments.INCOMPLETE_TTL_SECONDS)
+    return cards
+
+
+def load_rating_slots(menu_date: date, day_top_pick: Optional[dict]) -> dict:
+    """
+    Get the values of every restaurant's rating slots (counts and top-pick marker).
+    Cached per restaurant and ratings version, so a vote only re-reads its own
+    restaurant's counts; all uncached restaurants are read in one round trip.
+
+    Returns:
+        Dict mapping restaurant_id to {(slot kind, meal_name): html}
+    """
+    keys = {}
+    for restaurant in RESTAURANTS:
+        restaurant_id = restaurant['id']
+        top_meal = day_top_pick['meal_name'] if day_top_pick and day_top_pick['restaurant_id'] == restaurant_id else None
+        keys[restaurant_id] = (
+            'counts', restaurant_id, menu_date, page_cache.ratings_version(restaurant_id), top_meal
+        )
+
+    uncached = [
+        restaurant_id for restaurant_id, key in keys.items()
+        if fragments.peek(key) is None
+    ]
+    ratings = get_ratings_overview(uncached, menu_date)[0] if uncached else {}
+
+    def build(restaurant_id: str) -> dict:
+        summary = ratings.get(restaurant_id)
+        if summary is None:
+            summary = get_ratings_summary(restaurant_id, menu_date)
+        values = {}
+        for meal_name, counts in summary.items():
+            values[('up', meal_name)] = str(counts.get('up', 0) or '')
+            values[('down', meal_name)] = str(counts.get('down', 0) or '')
+        top_meal = keys[restaurant_id][-1]
+        if top_meal:
+            values[('top_class', top_meal)] = ' top-pick'
+            values[('top_badge', top_meal)] = TOP_PICK_BADGE
+        return values
+
+    return {
+        restaurant_id: fragments.get(key, lambda restaurant_id=restaurant_id: build(restaurant_id),
+                                     ttl=fragments.COUNTS_TTL_SECONDS)
+        for restaurant_id, key in keys.items()
+    }
+
+
+@app.route('/api/menus')
+def api_menus():
+    """
+    Get every restaurant's menu for a day as JSON.
+    Query params: lang (defaults to Accept-Language), date (YYYY-MM-DD, defaults to today).
+    Meals are {"label": str or null, "description": str}.
+    """
+    lang = request_language()
+    menu_date = parse_menu_date(request.args.get('date'))
+
+    with metrics.timed('scrape'):
+        menu_store.ensure_fresh([restaurant['id'] for restaurant in RESTAURANTS])
+
+    def build():
+        menus, complete = load_menus(lang, menu_date)
+        return {
+            'date': menu_date.isoformat(),
+            'lang': lang,
+            'restaurants': [
+                {
+                    'id': restaurant['id'],
+                    'name': restaurant['name'],
+                    'meals': [menu_api.normalize_meal(meal) for meal in menu],
+                }
+                for restaurant, menu in zip(RESTAURANTS, menus)
+            ],
+        }, complete
+
+    # Only translated responses change with new translations
+    generation = pretranslate.generation() if lang != DEFAULT_LANGUAGE else None
+    cache_key = (lang, menu_date, menu_store.menu_version(), generation)
+    with metrics.timed('serialize'):
+        entry = menu_api.get(cache_key, build)
+    return menu_api.respond(entry, request)
+
+
+@app.route('/api/menu-status')
+def api_menu_status():
+    """Get freshness and per-source fetch/parse durations of the menu store."""
+    return jsonify(menu_store.status())
+
+
+@app.route('/api/translation-status')
+def api_translation_status():
+    """Get translation cache hit/miss and pre-translation counters."""
+    return jsonify({
+        'cache': translation_cache.stats(),
+        'pretranslate': pretranslate.stats(),
+    })
+
+
+@app.route('/metrics')
+def api_metrics():
+    """Prometheus metrics: stage latency histograms, cache hit rates and pool state."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/db-status')
+def api_db_status():
+    """Get the database circuit breaker state and connection pool usage."""
+    return jsonify(get_pool_stats())
 
 
 @app.route('/api/rate', methods=['POST'])
@@ -314,17 +455,34 @@ def rate_meal():
     
     if restaurant_id not in ['iss', 'nest', 'compass']:
         return jsonify({'error': 'Invalid restaurant_id'}), 400
-    
-    success = add_rating(restaurant_id, meal_name, rating)
-    if success:
-        # Return updated ratings for this restaurant
-        updated_ratings = get_ratings_summary(restaurant_id)
-        return jsonify({
+
+    if not isinstance(meal_name, str) or len(meal_name) > 500:
+        return jsonify({'error': 'Invalid meal_name'}), 400
+
+    if get_pool() is None:
+        return jsonify({'error': 'Database not available'}), 503
+
+    # Turn away floods and repeat votes before they cost a database write
+    rejected, retry_after = admission.admit(
+        admission.voter_id(request), admission.client_ip(request), restaurant_id, meal_name
+    )
+    if rejected == 'rate_limited':
+        response = jsonify({'error': 'Too many votes, please wait a moment'})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, round(retry_after)))
+    elif rejected == 'duplicate':
+        response = jsonify({'error': 'You already rated this meal today'})
+        response.status_code = 409
+    else:
+        # Acknowledge right away; the vote is written with the next batch
+        counts = vote_buffer.add(restaurant_id, meal_name, rating)
+        top_pick.record_vote(restaurant_id, meal_name, rating)
+        page_cache.bump_ratings_version([restaurant_id])
+        response = jsonify({
             'success': True,
-            'ratings': updated_ratings.get(meal_name, {'up': 0, 'down': 0, 'score': 0})
+            'ratings': counts
         })
-    else:
-        return jsonify({'error': 'Database not available'}), 503
+    return response
 
 
 @app.route('/api/ratings/<restaurant_id>')
@@ -337,16 +495,123 @@ def get_restaurant_ratings(restaurant_id):
     return jsonify(ratings)
 
 
+def parse_ratings_range():
+    """
+    Read the ?from=, ?to= (YYYY-MM-DD, inclusive) and ?restaurant_id= filters
+    of the history and export endpoints. The range defaults to the last 30 days.
+
+    Returns:
+        Tuple of (start, end, restaurant_id or None, error message or None)
+    """
+    try:
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else date.today()
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') else end - timedelta(days=30)
+    except ValueError:
+        return None, None, None, 'Dates must be YYYY-MM-DD'
+    if start > end:
+        return None, None, None, "'from' must not be after 'to'"
+    restaurant_id = request.args.get('restaurant_id') or None
+    if restaurant_id is not None and restaurant_id not in ['iss', 'nest', 'compass']:
+        return None, None, None, 'Invalid restaurant_id'
+    return start, end, restaurant_id, None
+
+
+@app.route('/api/ratings/history')
+def api_ratings_history():
+    """
+    Daily per-meal vote counts over a date range, streamed as a JSON array.
+    Query: ?from=YYYY-MM-DD&to=YYYY-MM-DD&restaurant_id=iss (all optional)
+    """
+    start, end, restaurant_id, error = parse_ratings_range()
+    if error:
+        return jsonify({'error': error}), 400
+    if get_pool() is None:
+        return jsonify({'error': 'Database not available'}), 503
+
+    rows = iter_ratings_history(start, end, restaurant_id)
+    return Response(ratings_export.json_array_chunks(rows, HISTORY_COLUMNS), mimetype='application/json')
+
+
+@app.route('/api/ratings/export')
+def api_ratings_export():
+    """
+    Download the raw votes of a date range, streamed.
+    Query: ?format=csv|ndjson (default csv) plus the filters of /api/ratings/history
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ratings_export.FORMATS:
+        return jsonify({'error': 'Format must be csv or ndjson'}), 400
+    start, end, restaurant_id, error = parse_ratings_range()
+    if error:
+        return jsonify({'error': error}), 400
+    if get_pool() is None:
+        return jsonify({'error': 'Database not available'}), 503
+
+    rows = iter_ratings(start, end, restaurant_id)
+    filename = f"ratings-{restaurant_id or 'all'}-{start.isoformat()}-{end.isoformat()}.{export_format}"
+    return Response(
+        ratings_export.encode(rows, RATING_COLUMNS, export_format),
+        mimetype=ratings_export.FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+
 @app.route('/api/top-pick')
 def api_top_pick():
-    """Get today's top-rated meal."""
-    top = get_top_pick()
+    """Get today's top-rated meal (answered from memory, see services/top_pick.py)."""
+    top = top_pick.get()
     if top:
         return jsonify(top)
     return jsonify({'message': 'No ratings yet today'}), 404
 
+
+@app.route('/api/ratings/stream')
+def api_ratings_stream():
+    """
+    Server-Sent Events stream of today's rating counts and top pick.
+    Sends the full state on connect, then coalesced 'ratings' events.
+    """
+    if not FEATURE_RATINGS:
+        return jsonify({'error': 'Ratings are disabled'}), 404
+
+    stream = rating_stream.open_stream(request.headers.get('Last-Event-ID'))
+    if stream is None:
+        return jsonify({'error': 'Too many live connections'}), 503
+
+    return Response(
+        stream,
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Don't let a reverse proxy buffer the stream
+            'X-Accel-Buffering': 'no',
+        },
+    )
+
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create or migrate the schema (run once per deploy, before the workers start)."""
+    if init_db():
+        click.echo("Database initialized")
+    else:
+        click.echo("Database not configured or unavailable, skipping schema setup")
+
+
+@app.cli.command('rebuild-rollup')
+@click.option('--since', default=None, help='Only rebuild days from this date on (YYYY-MM-DD)')
+def rebuild_rollup_command(since):
+    """Backfill or repair the ratings_daily rollup from the raw ratings."""
+    init_db()
+    rows = rebuild_rollup(date.fromisoformat(since) if since else None)
+    if rows is None:
+        raise click.ClickException('Database not configured or unavailable')
+    click.echo(f"Rebuilt {rows} rollup rows")
+
+
 if __name__ == '__main__':
     import os
     # Initialize database on startup
     init_db()
+    restore_snapshots()
     app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)), debug=True)
\ No newline at end of file
@@ -0,0 +1,324 @@
+"""
+HTTP load test that runs fully offline.
+Serves the recorded upstream pages in benchmarks/fixtures from a local stub
+server, replaces the Azure translator with an instant fake, and uses an
+in-memory stand-in for the ratings database unless POSTGRES_CONNECTION_STRING
+is set (then the real database is used; votes go to today's date).
+The app runs in a child process on gunicorn with gunicorn.conf.py; this
+process drives each scenario at the given concurrency and reports
+requests/s and p50/p95/p99 latency.
+
+Usage:
+    python -m benchmarks.load_test [--requests 500] [--concurrency 20]
+        [--scenario index --scenario rate ...] [--upstream-latency-ms 0]
+        [--db-latency-ms 0] [--json results.json]
+
+Compare two commits by saving each run with --json and diffing the files.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+UPSTREAM_ROUTES = {
+    '/iss': ('iss.html', 'text/html; charset=utf-8'),
+    '/nest': ('nest.html', 'text/html; charset=utf-8'),
+    '/compass': ('compass.rss', 'application/rss+xml; charset=utf-8'),
+}
+
+RESTAURANT_IDS = ['iss', 'nest', 'compass']
+MEAL_NAMES = [f"Benchmark meal {index}" for index in range(20)]
+
+REQUEST_TIMEOUT = 10
+
+
+# --- Offline upstream -------------------------------------------------------
+
+def start_upstream(latency_ms: float) -> ThreadingHTTPServer:
+    """Serve the fixtures on an ephemeral port (like the real sites, with a fixed ETag)."""
+    bodies = {}
+    for path, (filename, content_type) in UPSTREAM_ROUTES.items():
+        with open(os.path.join(FIXTURES_DIR, filename), 'rb') as f:
+            bodies[path] = (f.read(), content_type)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            body = bodies.get(self.path.split('?')[0])
+            if body is None:
+                self.send_error(404)
+                return
+            etag = f'"{hash(body[0]) & 0xffffffff:x}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', body[1])
+            self.send_header('Content-Length', str(len(body[0])))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body[0])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# --- Fakes installed in the app process --------------------------------------
+
+class FakeTranslator:
+    """Stands in for TextTranslationClient: 'translates' by tagging the text."""
+
+    def translate(self, body, to_language, from_language=None):
+        return [
+            SimpleNamespace(translations=[SimpleNamespace(text=f"[{to_language[0]}] {text}")])
+            for text in body
+        ]
+
+
+class MemoryRatings:
+    """In-memory stand-in for the ratings functions of services.database."""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.lock = threading.Lock()
+        # (restaurant_id, meal_date, meal_name) -> {'up', 'down', 'score'}
+        self.rollup = {}
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def add_ratings_batch(self, votes: list) -> bool:
+        self._wait()
+        with self.lock:
+            for restaurant_id, meal_name, rating, meal_date in votes:
+                counts = self.rollup.setdefault((restaurant_id, meal_date, meal_name), {'up': 0, 'down': 0, 'score': 0})
+                counts['up' if rating == 1 else 'down'] += 1
+                counts['score'] += rating
+        return True
+
+    def add_rating(self, restaurant_id, meal_name, rating, meal_date=None) -> bool:
+        return self.add_ratings_batch([(restaurant_id, meal_name, rating, meal_date or date.today())])
+
+    def get_ratings_summary(self, restaurant_id, meal_date=None) -> dict:
+        self._wait()
+        meal_date = meal_date or date.today()
+        with self.lock:
+            return {
+                meal_name: dict(counts) for (rid, day, meal_name), counts in self.rollup.items()
+                if rid == restaurant_id and day == meal_date
+            }
+
+    def get_ratings_overview(self, restaurant_ids, meal_date=None) -> tuple:
+        summaries = {restaurant_id: self.get_ratings_summary(restaurant_id, meal_date) for restaurant_id in restaurant_ids}
+        return summaries, None
+
+    def get_daily_scores(self, meal_date=None) -> list:
+        self._wait()
+        meal_date = meal_date or date.today()
+        with self.lock:
+            return [
+                {'restaurant_id': rid, 'meal_name': meal_name, 'score': counts['score'],
+                 'total_votes': counts['up'] + counts['down']}
+                for (rid, day, meal_name), counts in self.rollup.items() if day == meal_date
+            ]
+
+
+def install_fakes(db_latency_ms: float):
+    """
+    Swap in the fake translator and, without a database, the in-memory ratings.
+    Must run before the app is imported (modules import these functions by name).
+    """
+    from services import database, translator
+    translator._client = FakeTranslator()
+    if not os.getenv('POSTGRES_CONNECTION_STRING'):
+        ratings = MemoryRatings(db_latency_ms)
+        for name in ('add_rating', 'add_ratings_batch', 'get_ratings_summary',
+                     'get_ratings_overview', 'get_daily_scores'):
+            setattr(database, name, getattr(ratings, name))
+        # /api/rate refuses votes without a pool; there's no schema to create
+        database.get_pool = lambda: ratings
+        database.init_db = lambda: False
+
+
+def serve(port: int, db_latency_ms: float):
+    """Child process: run the app on gunicorn with the fakes installed."""
+    os.chdir(ROOT_DIR)
+    install_fakes(db_latency_ms)
+    from gunicorn.app.wsgiapp import WSGIApplication
+    import sys
+    sys.argv = ['gunicorn', '--config', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+                '--access-logfile', os.devnull, '--log-level', 'warning', 'app:app']
+    WSGIApplication('%(prog)s [OPTIONS] [APP_MODULE]').run()
+
+
+# --- Load generation ---------------------------------------------------------
+
+def _request(base_url: str, scenario: str):
+    if scenario == 'index':
+        lang = random.choice(['en', 'fi', 'sv'])
+        return urllib.request.Request(f"{base_url}/?lang={lang}")
+    if scenario == 'rate':
+        body = json.dumps({
+            'restaurant_id': random.choice(RESTAURANT_IDS[:2]),
+            'meal_name': random.choice(MEAL_NAMES),
+            'rating': random.choice([1, 1, -1]),
+        }).encode('utf-8')
+        # urllib keeps no cookies, so votes are told apart by client address; a different
+        # address per vote keeps them from being rejected as repeats or floods
+        client = f"10.{random.randrange(256)}.{random.randrange(256)}.{random.randrange(256)}"
+        return urllib.request.Request(f"{base_url}/api/rate", data=body,
+                                      headers={'Content-Type': 'application/json', 'X-Forwarded-For': client})
+    if scenario == 'ratings':
+        return urllib.request.Request(f"{base_url}/api/ratings/{random.choice(RESTAURANT_IDS)}")
+    if scenario == 'top-pick':
+        return urllib.request.Request(f"{base_url}/api/top-pick")
+    raise ValueError(scenario)
+
+
+def _timed_call(base_url: str, scenario: str):
+    started = time.perf_counter()
+    try:
+        urllib.request.urlopen(_request(base_url, scenario), timeout=REQUEST_TIMEOUT).read()
+    except urllib.error.HTTPError as e:
+        # 404 from /api/top-pick before the first vote is a valid answer
+        if e.code >= 500:
+            return None
+        e.read()
+    except Exception:
+        return None
+    return (time.perf_counter() - started) * 1000
+
+
+def _percentile(values: list, pct: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * pct / 100))], 2)
+
+
+def run_scenario(base_url: str, scenario: str, requests: int, concurrency: int) -> dict:
+    """Send `requests` requests of one scenario and summarize the latencies."""
+    # Warm-up so the first-render and connection costs don't skew the percentiles
+    for _ in range(min(concurrency, 10)):
+        _timed_call(base_url, scenario)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(lambda _: _timed_call(base_url, scenario), range(requests)))
+    elapsed = time.perf_counter() - started
+
+    ok = [latency for latency in latencies if latency is not None]
+    return {
+        'scenario': scenario,
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': requests - len(ok),
+        'rps': round(len(ok) / elapsed, 1),
+        'p50_ms': _percentile(ok, 50),
+        'p95_ms': _percentile(ok, 95),
+        'p99_ms': _percentile(ok, 99),
+    }
+
+
+def _wait_until_up(base_url: str, timeout: float = 30) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"{base_url}/api/menu-status", timeout=1).read()
+            return True
+        except Exception:
+            time.sleep(0.2)
+    return False
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', action='append', dest='scenarios',
+                        choices=['index', 'rate', 'ratings', 'top-pick'],
+                        help='Scenarios to run (default: all)')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--upstream-latency-ms', type=float, default=0, help='Delay added by the stub upstream')
+    parser.add_argument('--db-latency-ms', type=float, default=0, help='Delay added by the in-memory database')
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+
+    upstream = start_upstream(args.upstream_latency_ms)
+    upstream_url = f"http://127.0.0.1:{upstream.server_port}"
+    workdir = tempfile.mkdtemp(prefix='keilamenu-load-')
+    os.environ.update({
+        'ISS_MENU_URL': f"{upstream_url}/iss",
+        'NEST_MENU_URL': f"{upstream_url}/nest",
+        'COMPASS_MENU_URL': f"{upstream_url}/compass",
+        'FEATURE_RATINGS': 'true',
+        'FEATURE_LANGUAGE_SELECTOR': 'true',
+        # Fixture menus must not become the checkout's last-known-good menus, and
+        # real snapshots must not leak into the run
+        'MENU_SNAPSHOT_DIR': os.path.join(workdir, 'snapshots'),
+        'TRANSLATION_CACHE_BACKEND': 'sqlite',
+        'TRANSLATION_CACHE_PATH': os.path.join(workdir, 'translations.sqlite3'),
+    })
+
+    # fork keeps the environment and lets the child install fakes before importing the app
+    context = multiprocessing.get_context('fork')
+    server = context.Process(target=serve, args=(args.port, args.db_latency_ms), daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        if not _wait_until_up(base_url):
+            raise SystemExit('App did not start')
+
+        results = []
+        for scenario in args.scenarios or ['index', 'rate', 'ratings', 'top-pick']:
+            result = run_scenario(base_url, scenario, args.requests, args.concurrency)
+            results.append(result)
+            print(f"{scenario:10} {result['rps']:>8} req/s  p50 {result['p50_ms']} ms  "
+                  f"p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  "
+                  f"errors {result['errors']}/{result['requests']}")
+    finally:
+        server.terminate()
+        server.join(timeout=30)
+        upstream.shutdown()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'commit': _git_commit(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'database': 'postgres' if os.getenv('POSTGRES_CONNECTION_STRING') else 'memory',
+                'upstream_latency_ms': args.upstream_latency_ms,
+                'db_latency_ms': args.db_latency_ms,
+                'results': results,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Parse benchmark for the menu scrapers.
+Runs each scraper's parse step against the stored fixtures with every available
+backend, with and without subtree restriction, and reports the mean parse time
+and peak memory. Every variant's output is checked against the html.parser
+full-tree baseline.
+
+Usage:
+    python -m benchmarks.parse_bench [--repeat 20] [--json results.json]
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+from datetime import date
+
+from services import parsing, scrapers
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+# Fixed weekday so the Nest parser finds a section regardless of when the benchmark runs
+BENCH_DAY = date(2026, 10, 15)
+
+SCRAPERS = {
+    'iss': ('iss.html', scrapers.parse_iss_week),
+    'nest': ('nest.html', lambda content: scrapers.parse_nest(content, BENCH_DAY)),
+    'compass': ('compass.rss', scrapers.parse_compass),
+}
+
+
+def _load_fixture(filename: str) -> bytes:
+    with open(os.path.join(FIXTURES_DIR, filename), 'rb') as f:
+        return f.read()
+
+
+def _run_parse(parse, content):
+    # The ISS parser memoizes the last page; clear it so every run really parses
+    scrapers._iss_week_cache.clear()
+    return parse(content)
+
+
+def bench(parse, content, backend: str, restrict: bool, repeat: int) -> dict:
+    """Time one scraper/backend/restriction combination."""
+    parsing._backend = backend
+    parsing.RESTRICT_PARSING = restrict
+
+    result = _run_parse(parse, content)
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        _run_parse(parse, content)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    _run_parse(parse, content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'backend': backend,
+        'restricted': restrict,
+        'mean_ms': round(sum(timings) / len(timings), 2),
+        'p50_ms': round(timings[len(timings) // 2], 2),
+        'peak_kb': round(peak / 1024, 1),
+        'result': result,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per combination')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    report = {}
+    print(f"{'scraper':<9} {'backend':<12} {'subtree':<8} {'mean ms':>9} {'p50 ms':>9} {'peak KB':>10}  output")
+    for name, (filename, parse) in SCRAPERS.items():
+        content = _load_fixture(filename)
+        rows = []
+        baseline = None
+        for backend in parsing.available_backends():
+            for restrict in (False, True):
+                row = bench(parse, content, backend, restrict, args.repeat)
+                if baseline is None:
+                    baseline = row['result']
+                row['matches_baseline'] = row.pop('result') == baseline
+                rows.append(row)
+                print(f"{name:<9} {backend:<12} {'yes' if restrict else 'no':<8} "
+                      f"{row['mean_ms']:>9} {row['p50_ms']:>9} {row['peak_kb']:>10}  "
+                      f"{'ok' if row['matches_baseline'] else 'MISMATCH'}")
+        report[name] = {'fixture': filename, 'bytes': len(content), 'runs': rows}
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
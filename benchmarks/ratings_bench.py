@@ -0,0 +1,100 @@
+"""
+Latency benchmark for the index page's ratings queries.
+Compares the per-restaurant path (get_ratings_summary for each restaurant plus
+get_top_pick) with the single get_ratings_overview query, against the database
+in POSTGRES_CONNECTION_STRING. Read-only unless --seed is given.
+
+Usage:
+    python -m benchmarks.ratings_bench [--repeat 200] [--seed 2000]
+"""
+import argparse
+import random
+import time
+from datetime import date
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from services.database import (  # noqa: E402
+    add_rating,
+    get_connection,
+    get_ratings_overview,
+    get_ratings_summary,
+    get_top_pick,
+    init_db
+)
+
+RESTAURANT_IDS = ['iss', 'nest', 'compass']
+
+# Synthetic votes go to a date no real menu uses, and are removed afterwards
+SEED_DATE = date(2000, 1, 3)
+
+
+def per_restaurant_path(meal_date: date):
+    summaries = {restaurant_id: get_ratings_summary(restaurant_id, meal_date) for restaurant_id in RESTAURANT_IDS}
+    return summaries, get_top_pick(meal_date)
+
+
+def combined_path(meal_date: date):
+    return get_ratings_overview(RESTAURANT_IDS, meal_date)
+
+
+def measure(fn, meal_date: date, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(meal_date)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'mean_ms': round(sum(timings) / len(timings), 2),
+        'p50_ms': round(timings[len(timings) // 2], 2),
+        'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 2),
+    }
+
+
+def seed(votes: int):
+    meals = [f'Bench meal {i}' for i in range(6)]
+    for _ in range(votes):
+        add_rating(random.choice(RESTAURANT_IDS), random.choice(meals), random.choice((1, 1, -1)), SEED_DATE)
+
+
+def cleanup():
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM ratings WHERE meal_date = %s", (SEED_DATE,))
+            # The votes were also counted into the daily rollup
+            cur.execute("DELETE FROM ratings_daily WHERE meal_date = %s", (SEED_DATE,))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=200, help='timed runs per path')
+    parser.add_argument('--seed', type=int, default=0, help='insert this many synthetic votes on a scratch date')
+    args = parser.parse_args()
+
+    if not init_db():
+        raise SystemExit("POSTGRES_CONNECTION_STRING is not set or the database is unreachable")
+
+    meal_date = date.today()
+    if args.seed:
+        seed(args.seed)
+        meal_date = SEED_DATE
+
+    try:
+        # Warm the pool so neither path pays for the first connection
+        combined_path(meal_date)
+        if per_restaurant_path(meal_date) != combined_path(meal_date):
+            print("WARNING: the two paths returned different results")
+
+        for name, fn in (('per-restaurant', per_restaurant_path), ('combined', combined_path)):
+            result = measure(fn, meal_date, args.repeat)
+            print(f"{name:<15} mean {result['mean_ms']:>8} ms   p50 {result['p50_ms']:>8} ms   p95 {result['p95_ms']:>8} ms")
+    finally:
+        if args.seed:
+            cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Cold start report.
+For each feature configuration, measures how long `import app` takes (per
+top-level package, from `python -X importtime`) and how long a fresh gunicorn
+started with gunicorn.conf.py takes to answer its first `GET /`, including
+the worker's menu warm-up. Upstream sites are served from the recorded
+fixtures (see load_test.py), so the numbers don't depend on the network.
+
+Usage:
+    python -m benchmarks.startup_report [--variant minimal --variant full]
+        [--top 10] [--runs 3] [--json results.json]
+
+Track cold start across commits by saving each run with --json.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmarks.load_test import ROOT_DIR, _git_commit, start_upstream
+
+# Environment of each configuration (the features App Service can switch off)
+VARIANTS = {
+    'minimal': {'FEATURE_RATINGS': 'false', 'FEATURE_LANGUAGE_SELECTOR': 'false'},
+    'full': {'FEATURE_RATINGS': 'true', 'FEATURE_LANGUAGE_SELECTOR': 'true'},
+}
+
+# Heavy dependencies that should only load when their feature is used
+WATCHED = ['requests', 'bs4', 'lxml', 'psycopg2', 'azure']
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def import_times(env: dict) -> dict:
+    """
+    Import `app` in a fresh interpreter and break the time down.
+
+    Returns:
+        Dict with 'total_ms', 'packages' (top-level package -> own import ms,
+        heaviest first) and 'loaded' (which WATCHED packages were imported)
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    total_us = 0
+    packages = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        top = module.split('.')[0]
+        packages[top] = packages.get(top, 0) + int(self_us)
+        if module == 'app' and len(indent) == 1:
+            total_us = int(cumulative_us)
+    return {
+        'total_ms': round(total_us / 1000, 1),
+        'packages': {
+            name: round(us / 1000, 1) for name, us in sorted(packages.items(), key=lambda item: -item[1])
+        },
+        'loaded': [name for name in WATCHED if name in packages],
+    }
+
+
+def first_response(env: dict, port: int, timeout: float = 60) -> dict:
+    """
+    Start gunicorn and time it until the first index page is served.
+
+    Returns:
+        Dict with 'first_response_ms', or an 'error'
+    """
+    env = dict(env, PORT=str(port))
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+         '--access-logfile', os.devnull, '--log-level', 'warning', 'app:app'],
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            try:
+                with urllib.request.urlopen(f"{base_url}/", timeout=timeout) as response:
+                    response.read()
+                return {'first_response_ms': round((time.perf_counter() - started) * 1000, 1)}
+            except Exception:
+                pass
+            time.sleep(0.02)
+        return {'error': 'no response'}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def _median(values: list):
+    values = sorted(value for value in values if value is not None)
+    return values[len(values) // 2] if values else None
+
+
+def report(variant: str, runs: int, port: int, base_env: dict) -> dict:
+    """Measure one configuration `runs` times and keep the median of each number."""
+    env = dict(base_env, **VARIANTS[variant])
+    imports = [import_times(env) for _ in range(runs)]
+    responses = [first_response(env, port) for _ in range(runs)]
+    median_imports = sorted(imports, key=lambda run: run['total_ms'])[len(imports) // 2]
+    return {
+        'variant': variant,
+        'runs': runs,
+        'import_ms': median_imports['total_ms'],
+        'packages': median_imports['packages'],
+        'loaded': median_imports['loaded'],
+        'first_response_ms': _median([r.get('first_response_ms') for r in responses]),
+        'errors': sum(1 for r in responses if 'error' in r),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--variant', action='append', dest='variants', choices=sorted(VARIANTS),
+                        help='Configurations to measure (default: all)')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per configuration (the median is reported)')
+    parser.add_argument('--top', type=int, default=10, help='Packages listed per configuration')
+    parser.add_argument('--port', type=int, default=8767)
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+
+    upstream = start_upstream(0)
+    upstream_url = f"http://127.0.0.1:{upstream.server_port}"
+    workdir = tempfile.mkdtemp(prefix='keilamenu-startup-')
+    base_env = dict(
+        os.environ,
+        ISS_MENU_URL=f"{upstream_url}/iss",
+        NEST_MENU_URL=f"{upstream_url}/nest",
+        COMPASS_MENU_URL=f"{upstream_url}/compass",
+        # Measure a real cold start: no menu snapshots or translations from earlier runs
+        MENU_SNAPSHOT_DIR=os.path.join(workdir, 'snapshots'),
+        TRANSLATION_CACHE_BACKEND='sqlite',
+        TRANSLATION_CACHE_PATH=os.path.join(workdir, 'translations.sqlite3'),
+    )
+
+    results = []
+    try:
+        for variant in args.variants or list(VARIANTS):
+            result = report(variant, args.runs, args.port, base_env)
+            results.append(result)
+            print(f"{variant}: import app {result['import_ms']} ms, first response {result['first_response_ms']} ms, errors {result['errors']}/{args.runs}")
+            print(f"  heavy packages loaded at import: {', '.join(result['loaded']) or 'none'}")
+            for name, ms in list(result['packages'].items())[:args.top]:
+                print(f"  {name:24} {ms:>8} ms")
+    finally:
+        upstream.shutdown()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'commit': _git_commit(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'results': results,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Worker model benchmark.
+Starts gunicorn with gunicorn.conf.py once per worker class, holds a number of
+live rating streams open (like wall displays) and measures index page
+throughput and latency next to them. With the sync worker every stream
+occupies the only worker, so page requests time out; with gevent they don't.
+Upstream sites are served from the recorded fixtures (see load_test.py), so
+the numbers don't depend on the network.
+
+Usage:
+    python -m benchmarks.worker_bench [--worker-class sync --worker-class gevent]
+        [--streams 5] [--requests 200] [--concurrency 10] [--json results.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.load_test import ROOT_DIR, start_upstream
+
+REQUEST_TIMEOUT = 5
+
+
+def _wait_until_up(base_url: str, timeout: float = 30) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"{base_url}/api/menu-status", timeout=1).read()
+            return True
+        except Exception:
+            time.sleep(0.2)
+    return False
+
+
+def _hold_stream(base_url: str, stop: threading.Event):
+    try:
+        with urllib.request.urlopen(f"{base_url}/api/ratings/stream", timeout=REQUEST_TIMEOUT) as response:
+            while not stop.is_set():
+                response.readline()
+    except Exception:
+        pass
+
+
+def _timed_get(url: str):
+    started = time.perf_counter()
+    try:
+        urllib.request.urlopen(url, timeout=REQUEST_TIMEOUT).read()
+        return (time.perf_counter() - started) * 1000
+    except Exception:
+        return None
+
+
+def _percentile(values: list, pct: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * pct / 100))], 1)
+
+
+def bench(worker_class: str, port: int, streams: int, requests: int, concurrency: int, base_env: dict) -> dict:
+    """Run one worker class and measure the index page next to open streams."""
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(base_env, PORT=str(port), GUNICORN_WORKER_CLASS=worker_class, FEATURE_RATINGS='true')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'app:app'],
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    stop = threading.Event()
+    try:
+        if not _wait_until_up(base_url):
+            return {'worker_class': worker_class, 'error': 'server did not start'}
+
+        for _ in range(streams):
+            threading.Thread(target=_hold_stream, args=(base_url, stop), daemon=True).start()
+        time.sleep(0.5)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(_timed_get, [f"{base_url}/"] * requests))
+        elapsed = time.perf_counter() - started
+
+        ok = [latency for latency in latencies if latency is not None]
+        return {
+            'worker_class': worker_class,
+            'streams': streams,
+            'requests': requests,
+            'errors': requests - len(ok),
+            'rps': round(len(ok) / elapsed, 1),
+            'p50_ms': _percentile(ok, 50),
+            'p95_ms': _percentile(ok, 95),
+            'p99_ms': _percentile(ok, 99),
+        }
+    finally:
+        stop.set()
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--worker-class', action='append', dest='worker_classes',
+                        help='Worker classes to compare (default: sync and gevent)')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--streams', type=int, default=5, help='Live rating streams held open')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+
+    upstream = start_upstream(0)
+    upstream_url = f"http://127.0.0.1:{upstream.server_port}"
+    workdir = tempfile.mkdtemp(prefix='keilamenu-workers-')
+    base_env = dict(
+        os.environ,
+        ISS_MENU_URL=f"{upstream_url}/iss",
+        NEST_MENU_URL=f"{upstream_url}/nest",
+        COMPASS_MENU_URL=f"{upstream_url}/compass",
+        # Keep fixture menus and translations out of the checkout's snapshots and cache
+        MENU_SNAPSHOT_DIR=os.path.join(workdir, 'snapshots'),
+        TRANSLATION_CACHE_BACKEND='sqlite',
+        TRANSLATION_CACHE_PATH=os.path.join(workdir, 'translations.sqlite3'),
+    )
+
+    results = []
+    try:
+        for worker_class in args.worker_classes or ['sync', 'gevent']:
+            result = bench(worker_class, args.port, args.streams, args.requests, args.concurrency, base_env)
+            results.append(result)
+            if 'error' in result:
+                print(f"{worker_class:8} {result['error']}")
+                continue
+            print(f"{worker_class:8} {result['rps']:>8} req/s  p50 {result['p50_ms']} ms  "
+                  f"p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  "
+                  f"errors {result['errors']}/{result['requests']}")
+    finally:
+        upstream.shutdown()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -22,10 +22,47 @@ ON ratings (restaurant_id, meal_date);
 CREATE INDEX IF NOT EXISTS idx_ratings_date_score
 ON ratings (meal_date, rating);
 
+-- Block-range index for date-range exports: votes are appended in meal_date
+-- order, so a few kilobytes of BRIN let multi-month scans skip everything else
+CREATE INDEX IF NOT EXISTS idx_ratings_meal_date_brin
+ON ratings USING BRIN (meal_date);
+
 -- For Cosmos DB for PostgreSQL (Citus), distribute the table:
 -- This command will fail on standard PostgreSQL but that's okay for local dev
 -- SELECT create_distributed_table('ratings', 'restaurant_id');
 
+-- Daily rollup: per-meal vote counters maintained by upsert on every vote write,
+-- so the page reads point lookups instead of aggregating raw ratings
+CREATE TABLE IF NOT EXISTS ratings_daily (
+    restaurant_id VARCHAR(50) NOT NULL,      -- Shard/distribution key, co-located with ratings
+    meal_date DATE NOT NULL,
+    meal_name VARCHAR(500) NOT NULL,
+    up INTEGER NOT NULL DEFAULT 0,
+    down INTEGER NOT NULL DEFAULT 0,
+    score INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (restaurant_id, meal_date, meal_name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_ratings_daily_date
+ON ratings_daily (meal_date);
+
+-- SELECT create_distributed_table('ratings_daily', 'restaurant_id', colocate_with => 'ratings');
+-- Backfill or repair from raw votes: flask --app app rebuild-rollup [--since YYYY-MM-DD]
+
+-- Translation cache: Azure Translator results shared across workers and restarts
+-- Keyed by SHA-256 of the source text plus the language pair
+CREATE TABLE IF NOT EXISTS translations (
+    text_hash CHAR(64) NOT NULL,
+    source_lang VARCHAR(10) NOT NULL,
+    target_lang VARCHAR(10) NOT NULL,
+    translated_text TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (text_hash, source_lang, target_lang)
+);
+
+-- On Citus, replicate the small translation cache to every node:
+-- SELECT create_reference_table('translations');
+
 -- Example restaurant_id values used in the app:
 -- 'iss' - ISS FG restaurant
 -- 'nest' - Nest Restaurant  
@@ -0,0 +1,49 @@
+"""
+Gunicorn configuration for production (used by startup.sh).
+
+Runs gevent workers: blocking socket I/O in the scrapers, the translator and
+(through psycogreen) psycopg2 yields to other requests, so a slow upstream no
+longer stalls every visitor and idle rating streams only hold a greenlet.
+Override any setting with the GUNICORN_* variables below.
+
+Nothing here imports the app in the master process: modules that create
+locks at import must be loaded after the gevent worker has monkey-patched
+threading, or their locks block the whole worker. The schema is set up
+before gunicorn starts (see startup.sh).
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# One worker keeps a single copy of the menu, translation and top-pick caches;
+# add workers for CPU headroom (each one warms its own menus on start)
+workers = int(os.getenv('GUNICORN_WORKERS', '1'))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gevent')
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
+
+# Only a worker that stops responding is killed; long requests and streams are fine under gevent
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+
+
+def post_fork(server, worker):
+    """Make psycopg2 cooperative so database calls yield to other greenlets."""
+    # Without a database psycopg2 is never imported, so there's nothing to patch
+    if worker_class == 'gevent' and os.getenv('POSTGRES_CONNECTION_STRING'):
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+
+
+def post_worker_init(worker):
+    """Scrape today's menus and seed the ratings before the worker takes traffic."""
+    import app
+    app.warm_up()
+
+
+def worker_exit(server, worker):
+    """Write buffered votes before the worker goes away."""
+    from services import vote_buffer
+    vote_buffer.stop()
@@ -0,0 +1,190 @@
+"""
+Admission control for votes.
+Runs in front of the vote buffer so floods never reach the database. Each
+browser gets a random voter id cookie with the index page. It gets a token
+bucket (VOTE_RATE_PER_MINUTE sustained, VOTE_RATE_BURST at once) and one vote
+per meal and day. Votes without the cookie (scripts) are counted against
+their client IP instead, so dropping the cookie doesn't allow repeat votes.
+Each client IP also gets a much larger bucket on top, as a flood guard: a
+whole office behind one NAT address voting at lunchtime stays well inside it. Every table is a bounded LRU, so
+memory stays flat no matter how many clients show up, and a check is a hash
+and a few dict lookups.
+"""
+import hashlib
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Optional, Tuple
+from flask import Request, Response
+from services import metrics
+
+# Sustained votes per browser and minute (0 turns rate limiting off)
+RATE_PER_MINUTE = float(os.getenv('VOTE_RATE_PER_MINUTE', '30'))
+
+# Votes a browser may cast in a quick burst before the rate applies
+BURST = float(os.getenv('VOTE_RATE_BURST', '10'))
+
+# Flood guard per client IP, shared by everyone behind the same address (0 turns it off)
+IP_RATE_PER_MINUTE = float(os.getenv('VOTE_IP_RATE_PER_MINUTE', '600'))
+IP_BURST = float(os.getenv('VOTE_IP_RATE_BURST', '300'))
+
+# Token buckets kept in memory (least recently seen voters and addresses are forgotten)
+MAX_CLIENTS = int(os.getenv('VOTE_ADMISSION_MAX_CLIENTS', '10000'))
+
+# Recent (voter, meal, day) votes remembered to reject repeats (0 turns it off)
+DEDUP_SIZE = int(os.getenv('VOTE_DEDUP_SIZE', '50000'))
+
+# Cookie holding the random voter id
+VOTER_COOKIE = 'voter_id'
+VOTER_COOKIE_MAX_AGE = 365 * 24 * 3600
+_VOTER_ID = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+
+# Proxies in front of the app that append to X-Forwarded-For (App Service adds one)
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', '1'))
+
+_lock = threading.Lock()
+
+# ('voter', id) or ('ip', address) -> [tokens, last refill time]
+_buckets: OrderedDict = OrderedDict()
+
+# 8-byte digests of (voter, restaurant, meal, day)
+_seen: OrderedDict = OrderedDict()
+
+_stats = {'admitted': 0, 'rate_limited': 0, 'duplicate': 0}
+
+
+def voter_id(request: Request) -> Optional[str]:
+    """Get the browser's voter id from its cookie (None if missing or malformed)."""
+    voter = request.cookies.get(VOTER_COOKIE, '')
+    return voter if _VOTER_ID.match(voter) else None
+
+
+def issue_voter_cookie(response: Response, request: Request):
+    """Give a browser that has no voter id yet a new random one."""
+    if voter_id(request) is not None:
+        return
+    secure = request.is_secure or request.headers.get('X-Forwarded-Proto') == 'https'
+    response.set_cookie(VOTER_COOKIE, secrets.token_urlsafe(16), max_age=VOTER_COOKIE_MAX_AGE,
+                        httponly=True, samesite='Lax', secure=secure)
+
+
+def client_ip(request: Request) -> str:
+    """
+    Get the address of the client behind a request.
+    Uses the X-Forwarded-For entry added by the last trusted proxy (entries
+    further left are set by the client and can be forged) and drops the port
+    App Service appends to IPv4 addresses.
+    """
+    forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+    if TRUSTED_PROXY_HOPS and forwarded:
+        address = forwarded[max(0, len(forwarded) - TRUSTED_PROXY_HOPS)]
+    else:
+        address = request.remote_addr or 'unknown'
+    if address.count(':') == 1:
+        address = address.split(':')[0]
+    return address
+
+
+def _refill(key: tuple, burst: float, rate_per_minute: float, now: float) -> list:
+    bucket = _buckets.get(key)
+    if bucket is None:
+        bucket = _buckets[key] = [burst, now]
+        while len(_buckets) > MAX_CLIENTS:
+            _buckets.popitem(last=False)
+    else:
+        _buckets.move_to_end(key)
+        bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate_per_minute / 60)
+        bucket[1] = now
+    return bucket
+
+
+def _take_tokens(voter: str, ip: str, now: float) -> float:
+    """
+    Spend a token of the voter and of its address (both or neither).
+
+    Returns:
+        0, or the seconds until both have a token again
+    """
+    buckets = []
+    if RATE_PER_MINUTE > 0:
+        buckets.append((_refill(('voter', voter), BURST, RATE_PER_MINUTE, now), RATE_PER_MINUTE))
+    if IP_RATE_PER_MINUTE > 0:
+        buckets.append((_refill(('ip', ip), IP_BURST, IP_RATE_PER_MINUTE, now), IP_RATE_PER_MINUTE))
+    wait = max([(1 - bucket[0]) * 60 / rate for bucket, rate in buckets if bucket[0] < 1], default=0.0)
+    if wait:
+        return wait
+    for bucket, _ in buckets:
+        bucket[0] -= 1
+    return 0.0
+
+
+def _vote_digest(voter: str, restaurant_id: str, meal_name: str, meal_date: date) -> bytes:
+    key = '\x1f'.join((voter, restaurant_id, meal_name, meal_date.isoformat()))
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+
+
+def admit(voter: Optional[str], ip: str, restaurant_id: str, meal_name: str,
+          meal_date: Optional[date] = None) -> Tuple[Optional[str], float]:
+    """
+    Decide whether a vote may be recorded.
+
+    Args:
+        voter: Browser's voter id (see voter_id); None counts the vote
+            against the client address
+        ip: Client address (see client_ip)
+        restaurant_id: The restaurant identifier
+        meal_name: Name of the meal
+        meal_date: Date of the meal (defaults to today)
+
+    Returns:
+        (None, 0) if the vote is admitted, ('rate_limited', seconds until the
+        client may vote again) or ('duplicate', 0) otherwise
+    """
+    if meal_date is None:
+        meal_date = date.today()
+    if voter is None:
+        # Can't collide with issued ids, which never contain ':'
+        voter = f"ip:{ip}"
+
+    with _lock:
+        retry_after = _take_tokens(voter, ip, time.monotonic())
+        if retry_after:
+            _stats['rate_limited'] += 1
+            reason = 'rate_limited'
+        else:
+            reason = None
+
+        if reason is None and DEDUP_SIZE > 0:
+            digest = _vote_digest(voter, restaurant_id, meal_name, meal_date)
+            if digest in _seen:
+                _seen.move_to_end(digest)
+                _stats['duplicate'] += 1
+                reason = 'duplicate'
+            else:
+                _seen[digest] = None
+                while len(_seen) > DEDUP_SIZE:
+                    _seen.popitem(last=False)
+
+        if reason is None:
+            _stats['admitted'] += 1
+
+    if reason is not None:
+        metrics.inc('vote_rejections_total', reason=reason)
+    return reason, retry_after
+
+
+def stats() -> dict:
+    """Admission counters and table sizes."""
+    with _lock:
+        return dict(_stats, clients=len(_buckets), remembered_votes=len(_seen))
+
+
+def reset():
+    """Forget every client and remembered vote."""
+    with _lock:
+        _buckets.clear()
+        _seen.clear()
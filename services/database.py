@@ -3,52 +3,325 @@ Database service for Cosmos DB for PostgreSQL.
 Handles connection pooling and ratings CRUD operations.
 Uses restaurant_id as the distribution/shard key for efficient queries.
 """
+import itertools
 import os
+import random
+import threading
+import time
 from datetime import date
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, Iterator, Optional
 from contextlib import contextmanager
-import psycopg2
-from psycopg2 import pool
-from psycopg2.extras import RealDictCursor
+from services import metrics
+
+# psycopg2 is imported where it's used, so an app without ratings never loads it
+if TYPE_CHECKING:
+    from psycopg2 import pool
+
+# Largest number of open connections per process
+POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+
+# Seconds to wait for a free connection before treating the database as unavailable
+CHECKOUT_TIMEOUT_SECONDS = float(os.getenv('DB_CHECKOUT_TIMEOUT_SECONDS', '5'))
+
+# Seconds before a connection attempt is abandoned
+CONNECT_TIMEOUT_SECONDS = int(os.getenv('DB_CONNECT_TIMEOUT_SECONDS', '5'))
+
+# Consecutive connection failures that open the circuit breaker
+BREAKER_THRESHOLD = int(os.getenv('DB_BREAKER_THRESHOLD', '3'))
+
+# First background probe delay once the breaker is open, doubled after every failed probe
+BREAKER_BACKOFF_SECONDS = float(os.getenv('DB_BREAKER_BACKOFF_SECONDS', '5'))
+BREAKER_MAX_BACKOFF_SECONDS = float(os.getenv('DB_BREAKER_MAX_BACKOFF_SECONDS', '300'))
+
+# Rows fetched per round trip by the server-side cursors of the streaming reads
+STREAM_BATCH_SIZE = int(os.getenv('DB_STREAM_BATCH_SIZE', '2000'))
+
+# Column order of the rows yielded by iter_ratings_history and iter_ratings
+HISTORY_COLUMNS = ('meal_date', 'restaurant_id', 'meal_name', 'up', 'down', 'score')
+RATING_COLUMNS = ('id', 'restaurant_id', 'meal_name', 'rating', 'meal_date', 'created_at')
 
 # Connection pool singleton
-_pool: Optional[pool.ThreadedConnectionPool] = None
+_pool: Optional['pool.ThreadedConnectionPool'] = None
 
+# pid -> this process's locks (see _locks)
+_process_locks: Dict[int, dict] = {}
+
+# Circuit breaker: 'closed' (normal), 'open' (failing fast, probing in the
+# background) or 'half_open' (a probe is connecting right now)
+_breaker = {'state': 'closed', 'failures': 0, 'backoff': BREAKER_BACKOFF_SECONDS, 'retry_at': 0.0}
+_probe: Optional[threading.Thread] = None
+_probe_pid: Optional[int] = None
+# Bumped by close_pool() so a running probe stops instead of reopening the pool
+_probe_generation = 0
+
+_stats_lock = threading.Lock()
+
+_stats = {
+    'checkouts': 0,
+    'checkout_wait_ms_total': 0.0,
+    'checkout_wait_ms_max': 0.0,
+    'checkout_timeouts': 0,
+    'in_use': 0,
+    'trips': 0,
+}
+
+
+def _locks() -> dict:
+    """
+    Get the pool lock, the checkout slots and the in-flight connect of this process.
+    They are created on first use rather than at import: a gevent worker
+    monkey-patches threading after it forks, so only locks made afterwards
+    yield to other greenlets instead of blocking the whole worker.
+    """
+    locks = _process_locks.get(os.getpid())
+    if locks is None:
+        # setdefault is atomic, so racing first callers still share one set
+        locks = _process_locks.setdefault(os.getpid(), {
+            'pool': threading.Lock(),
+            # Callers beyond POOL_MAX wait here instead of getting "connection pool exhausted"
+            'slots': threading.BoundedSemaphore(POOL_MAX),
+            # Event set when the connect in progress finishes, None when idle
+            'connecting': None,
+        })
+    return locks
 
-def get_pool() -> Optional[pool.ThreadedConnectionPool]:
-    """Get or create the connection pool singleton."""
+
+def _create_pool() -> 'pool.ThreadedConnectionPool':
+    from psycopg2 import pool
+    return pool.ThreadedConnectionPool(
+        minconn=1,
+        maxconn=POOL_MAX,
+        dsn=os.getenv('POSTGRES_CONNECTION_STRING'),
+        connect_timeout=CONNECT_TIMEOUT_SECONDS
+    )
+
+
+def _trip(error: Exception):
+    """Open the breaker: drop the pool and let a background probe find out when the database is back."""
+    global _pool
+    with _locks()['pool']:
+        if _breaker['state'] != 'closed':
+            return
+        print(f"Database unavailable, failing fast until it recovers: {error}")
+        _breaker['state'] = 'open'
+        _breaker['backoff'] = BREAKER_BACKOFF_SECONDS
+        _breaker['retry_at'] = time.time() + BREAKER_BACKOFF_SECONDS
+        with _stats_lock:
+            _stats['trips'] += 1
+        broken, _pool = _pool, None
+    if broken is not None:
+        try:
+            broken.closeall()
+        except Exception:
+            pass
+    _ensure_probe()
+
+
+def _record_failure(error: Exception):
+    with _locks()['pool']:
+        _breaker['failures'] += 1
+        tripped = _breaker['failures'] >= BREAKER_THRESHOLD
+    if tripped:
+        _trip(error)
+
+
+def _record_success():
+    if _breaker['failures']:
+        with _locks()['pool']:
+            _breaker['failures'] = 0
+
+
+def _run_probe(generation: int):
     global _pool
-    if _pool is None:
-        conn_string = os.getenv('POSTGRES_CONNECTION_STRING')
-        if conn_string:
+    while True:
+        delay = max(0.0, _breaker['retry_at'] - time.time())
+        time.sleep(delay)
+        if generation != _probe_generation:
+            return
+        _breaker['state'] = 'half_open'
+        try:
+            new_pool = _create_pool()
+            conn = new_pool.getconn()
             try:
-                _pool = pool.ThreadedConnectionPool(
-                    minconn=1,
-                    maxconn=10,
-                    dsn=conn_string
-                )
-            except Exception as e:
-                print(f"Database connection error: {e}")
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            finally:
+                new_pool.putconn(conn)
+        except Exception as e:
+            with _locks()['pool']:
+                _breaker['state'] = 'open'
+                _breaker['backoff'] = min(_breaker['backoff'] * 2, BREAKER_MAX_BACKOFF_SECONDS)
+                backoff = _breaker['backoff']
+                _breaker['retry_at'] = time.time() + backoff + random.uniform(0, backoff / 4)
+            print(f"Database probe failed, next attempt in {backoff:.0f}s: {e}")
+            continue
+
+        with _locks()['pool']:
+            if generation != _probe_generation:
+                new_pool.closeall()
+                return
+            _pool = new_pool
+            _breaker.update(state='closed', failures=0, backoff=BREAKER_BACKOFF_SECONDS, retry_at=0.0)
+        print("Database reachable again, breaker closed")
+        return
+
+
+def _ensure_probe():
+    """Start the probe thread unless one is running in this process (forked workers start their own)."""
+    global _probe, _probe_pid
+    with _locks()['pool']:
+        if _probe is not None and _probe.is_alive() and _probe_pid == os.getpid():
+            return
+        _probe = threading.Thread(target=_run_probe, args=(_probe_generation,), name='db-probe', daemon=True)
+        _probe_pid = os.getpid()
+        _probe.start()
+
+
+def get_pool() -> Optional['pool.ThreadedConnectionPool']:
+    """
+    Get or create the connection pool singleton.
+    Returns None without blocking while the database is unconfigured or the
+    breaker is open; callers arriving while another one connects wait for
+    that connect (up to CONNECT_TIMEOUT_SECONDS) instead of opening a second pool.
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+    if not os.getenv('POSTGRES_CONNECTION_STRING'):
+        return None
+    if _breaker['state'] != 'closed':
+        _ensure_probe()
+        return None
+
+    locks = _locks()
+    with locks['pool']:
+        if _pool is not None:
+            return _pool
+        generation = _probe_generation
+        connecting = locks['connecting']
+        if connecting is None:
+            connecting = locks['connecting'] = threading.Event()
+            owner = True
+        else:
+            owner = False
+
+    if not owner:
+        # Someone else is connecting: wait for their result instead of opening a second pool
+        connecting.wait(CONNECT_TIMEOUT_SECONDS)
+        return _pool
+
+    # Connect without holding the lock: the connect yields under gevent and
+    # other callers must still be able to get in and wait
+    new_pool = error = None
+    try:
+        new_pool = _create_pool()
+    except Exception as e:
+        print(f"Database connection error: {e}")
+        error = e
+    finally:
+        with locks['pool']:
+            locks['connecting'] = None
+            if new_pool is not None and generation == _probe_generation and _breaker['state'] == 'closed':
+                _pool = new_pool
+        connecting.set()
+
+    if new_pool is None:
+        # Failing to connect at all means the database is down: don't wait for more failures
+        _trip(error)
+        return None
+    if _pool is not new_pool:
+        # close_pool() or a trip happened meanwhile
+        new_pool.closeall()
     return _pool
 
 
 @contextmanager
 def get_connection():
-    """Context manager for getting a connection from the pool."""
+    """
+    Context manager for getting a connection from the pool.
+    Yields None when the database is unavailable (unconfigured, breaker open
+    or no free connection within CHECKOUT_TIMEOUT_SECONDS).
+    """
     p = get_pool()
     if p is None:
         yield None
         return
-    
-    conn = p.getconn()
+
+    import psycopg2
+    from psycopg2 import pool
+
+    started = time.perf_counter()
+    slots = _locks()['slots']
+    if not slots.acquire(timeout=CHECKOUT_TIMEOUT_SECONDS):
+        with _stats_lock:
+            _stats['checkout_timeouts'] += 1
+        print("Database connection checkout timed out")
+        yield None
+        return
     try:
-        yield conn
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
+        try:
+            conn = p.getconn()
+        except (psycopg2.OperationalError, pool.PoolError) as e:
+            _record_failure(e)
+            yield None
+            return
+        checked_out = time.perf_counter()
+        waited_ms = (checked_out - started) * 1000
+        metrics.observe('db_checkout_wait_seconds', checked_out - started)
+        with _stats_lock:
+            _stats['checkouts'] += 1
+            _stats['checkout_wait_ms_total'] += waited_ms
+            _stats['checkout_wait_ms_max'] = max(_stats['checkout_wait_ms_max'], waited_ms)
+            _stats['in_use'] += 1
+
+        try:
+            yield conn
+            conn.commit()
+            _record_success()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            # Connection-level failure: count it towards the breaker
+            _record_failure(e)
+            if not conn.closed:
+                conn.rollback()
+            raise
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            metrics.record('db', time.perf_counter() - checked_out, 'db_query_seconds')
+            with _stats_lock:
+                _stats['in_use'] -= 1
+            try:
+                # Broken connections are discarded instead of going back into the pool
+                p.putconn(conn, close=bool(conn.closed))
+            except pool.PoolError:
+                # The pool was closed by a breaker trip meanwhile
+                pass
     finally:
-        p.putconn(conn)
+        slots.release()
+
+
+def get_pool_stats() -> dict:
+    """Breaker state, pool usage and checkout wait times."""
+    with _stats_lock:
+        stats = dict(_stats)
+    checkouts = stats['checkouts']
+    p = _pool
+    return {
+        'configured': bool(os.getenv('POSTGRES_CONNECTION_STRING')),
+        'breaker': _breaker['state'],
+        'failures': _breaker['failures'],
+        'retry_in': round(max(0.0, _breaker['retry_at'] - time.time()), 1) if _breaker['state'] != 'closed' else None,
+        'trips': stats['trips'],
+        'pool_max': POOL_MAX,
+        'open_connections': len(p._pool) + len(p._used) if p is not None else 0,
+        'in_use': stats['in_use'],
+        'checkouts': checkouts,
+        'checkout_wait_ms_avg': round(stats['checkout_wait_ms_total'] / checkouts, 2) if checkouts else None,
+        'checkout_wait_ms_max': round(stats['checkout_wait_ms_max'], 2),
+        'checkout_timeouts': stats['checkout_timeouts'],
+    }
 
 
 def init_db():
@@ -61,7 +334,8 @@ def init_db():
         if conn is None:
             print("Database not configured, skipping init")
             return False
-        
+
+        import psycopg2
         with conn.cursor() as cur:
             # Create ratings table
             cur.execute("""
@@ -81,19 +355,85 @@ def init_db():
                 CREATE INDEX IF NOT EXISTS idx_ratings_restaurant_date 
                 ON ratings (restaurant_id, meal_date);
             """)
+
+            # Votes are appended in meal_date order, so a tiny BRIN index lets
+            # multi-month exports skip every block outside the range
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_ratings_meal_date_brin
+                ON ratings USING BRIN (meal_date);
+            """)
             
+            # Daily per-meal vote counters, maintained on every vote write
+            cur.execute("SELECT to_regclass('ratings_daily') IS NULL")
+            rollup_created = cur.fetchone()[0]
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS ratings_daily (
+                    restaurant_id VARCHAR(50) NOT NULL,
+                    meal_date DATE NOT NULL,
+                    meal_name VARCHAR(500) NOT NULL,
+                    up INTEGER NOT NULL DEFAULT 0,
+                    down INTEGER NOT NULL DEFAULT 0,
+                    score INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (restaurant_id, meal_date, meal_name)
+                );
+            """)
+
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_ratings_daily_date
+                ON ratings_daily (meal_date);
+            """)
+
+            # Translation cache shared by all workers (see services/translation_cache.py)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS translations (
+                    text_hash CHAR(64) NOT NULL,
+                    source_lang VARCHAR(10) NOT NULL,
+                    target_lang VARCHAR(10) NOT NULL,
+                    translated_text TEXT NOT NULL,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    PRIMARY KEY (text_hash, source_lang, target_lang)
+                );
+            """)
+
+            # Commit the tables first so a failed Citus call below can't roll them back
+            conn.commit()
+
             # Try to distribute table for Citus (Cosmos DB for PostgreSQL)
             # This will fail silently on regular PostgreSQL
             try:
                 cur.execute("""
                     SELECT create_distributed_table('ratings', 'restaurant_id');
                 """)
+                conn.commit()
                 print("Table distributed by restaurant_id (Citus mode)")
             except psycopg2.Error:
                 # Not running on Citus, that's fine for local dev
                 conn.rollback()
                 conn.commit()
                 print("Running on standard PostgreSQL (non-distributed)")
+
+            # Co-locate the rollup with its ratings so vote writes stay on one shard
+            try:
+                cur.execute("""
+                    SELECT create_distributed_table('ratings_daily', 'restaurant_id', colocate_with => 'ratings');
+                """)
+                conn.commit()
+            except psycopg2.Error:
+                conn.rollback()
+
+            conn.commit()
+            if rollup_created:
+                # First start with the rollup: backfill it from the existing votes
+                rows = rebuild_rollup()
+                print(f"Backfilled ratings_daily with {rows} rows")
+
+            # Translations are small and read on every node, so replicate them
+            try:
+                cur.execute("""
+                    SELECT create_reference_table('translations');
+                """)
+            except psycopg2.Error:
+                conn.rollback()
             
             print("Database initialized successfully")
             return True
@@ -127,12 +467,66 @@ def add_rating(restaurant_id: str, meal_name: str, rating: int, meal_date: Optio
                 INSERT INTO ratings (restaurant_id, meal_name, rating, meal_date)
                 VALUES (%s, %s, %s, %s)
             """, (restaurant_id, meal_name, rating, meal_date))
+            _upsert_rollup(cur, [(restaurant_id, meal_name, rating, meal_date)])
+            return True
+
+
+def _upsert_rollup(cur, votes: list):
+    """
+    Add votes to the ratings_daily counters in the caller's transaction.
+    Rows are pre-aggregated and written in key order so concurrent batches
+    can't deadlock on each other.
+    """
+    deltas = {}
+    for restaurant_id, meal_name, rating, meal_date in votes:
+        delta = deltas.setdefault((restaurant_id, meal_date, meal_name), [0, 0, 0])
+        if rating == 1:
+            delta[0] += 1
+        else:
+            delta[1] += 1
+        delta[2] += rating
+
+    from psycopg2.extras import execute_values
+    execute_values(cur, """
+        INSERT INTO ratings_daily (restaurant_id, meal_date, meal_name, up, down, score)
+        VALUES %s
+        ON CONFLICT (restaurant_id, meal_date, meal_name) DO UPDATE SET
+            up = ratings_daily.up + EXCLUDED.up,
+            down = ratings_daily.down + EXCLUDED.down,
+            score = ratings_daily.score + EXCLUDED.score
+    """, [key + tuple(delta) for key, delta in sorted(deltas.items())], page_size=500)
+
+
+def add_ratings_batch(votes: list) -> bool:
+    """
+    Add many ratings in a single multi-row INSERT.
+
+    Args:
+        votes: List of (restaurant_id, meal_name, rating, meal_date) tuples
+
+    Returns:
+        True if all ratings were written
+    """
+    if not votes:
+        return True
+
+    with get_connection() as conn:
+        if conn is None:
+            return False
+
+        with conn.cursor() as cur:
+            from psycopg2.extras import execute_values
+            execute_values(cur, """
+                INSERT INTO ratings (restaurant_id, meal_name, rating, meal_date)
+                VALUES %s
+            """, votes, page_size=500)
+            _upsert_rollup(cur, votes)
             return True
 
 
 def get_ratings_summary(restaurant_id: str, meal_date: Optional[date] = None) -> dict:
     """
-    Get aggregated ratings for a restaurant's meals.
+    Get aggregated ratings for a restaurant's meals from the daily rollup.
     
     Args:
         restaurant_id: The restaurant identifier
@@ -148,16 +542,12 @@ def get_ratings_summary(restaurant_id: str, meal_date: Optional[date] = None) ->
         if conn is None:
             return {}
         
+        from psycopg2.extras import RealDictCursor
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute("""
-                SELECT 
-                    meal_name,
-                    COUNT(*) FILTER (WHERE rating = 1) as up,
-                    COUNT(*) FILTER (WHERE rating = -1) as down,
-                    SUM(rating) as score
-                FROM ratings
+                SELECT meal_name, up, down, score
+                FROM ratings_daily
                 WHERE restaurant_id = %s AND meal_date = %s
-                GROUP BY meal_name
             """, (restaurant_id, meal_date))
             
             results = {}
@@ -184,17 +574,16 @@ def get_top_pick(meal_date: Optional[date] = None) -> Optional[dict]:
         if conn is None:
             return None
         
+        from psycopg2.extras import RealDictCursor
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             cur.execute("""
-                SELECT 
+                SELECT
                     restaurant_id,
                     meal_name,
-                    SUM(rating) as score,
-                    COUNT(*) as total_votes
-                FROM ratings
-                WHERE meal_date = %s
-                GROUP BY restaurant_id, meal_name
-                HAVING SUM(rating) > 0
+                    score,
+                    up + down as total_votes
+                FROM ratings_daily
+                WHERE meal_date = %s AND score > 0
                 ORDER BY score DESC, total_votes DESC
                 LIMIT 1
             """, (meal_date,))
@@ -210,9 +599,256 @@ def get_top_pick(meal_date: Optional[date] = None) -> Optional[dict]:
             return None
 
 
+def get_daily_scores(meal_date: Optional[date] = None) -> Optional[list]:
+    """
+    Get the score and vote count of every rated meal of a day, across all restaurants.
+    Used to seed and reconcile the in-memory top pick rather than on every request.
+
+    Returns:
+        List of dicts with restaurant_id, meal_name, score and total_votes,
+        or None if the database is unavailable
+    """
+    if meal_date is None:
+        meal_date = date.today()
+
+    with get_connection() as conn:
+        if conn is None:
+            return None
+
+        from psycopg2.extras import RealDictCursor
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT
+                    restaurant_id,
+                    meal_name,
+                    score,
+                    up + down as total_votes
+                FROM ratings_daily
+                WHERE meal_date = %s
+            """, (meal_date,))
+            return [dict(row) for row in cur.fetchall()]
+
+
+def get_ratings_overview(restaurant_ids: list, meal_date: Optional[date] = None) -> tuple:
+    """
+    Get the ratings summaries of several restaurants and the top pick in one query.
+    Replaces one get_ratings_summary call per restaurant plus get_top_pick.
+
+    Args:
+        restaurant_ids: The restaurant identifiers to summarize
+        meal_date: Date to filter by (defaults to today)
+
+    Returns:
+        Tuple of (dict mapping restaurant_id to a get_ratings_summary-style dict,
+        top pick dict as returned by get_top_pick or None)
+    """
+    if meal_date is None:
+        meal_date = date.today()
+
+    summaries = {restaurant_id: {} for restaurant_id in restaurant_ids}
+    with get_connection() as conn:
+        if conn is None:
+            return summaries, None
+
+        from psycopg2.extras import RealDictCursor
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT
+                    restaurant_id,
+                    meal_name,
+                    up,
+                    down,
+                    score,
+                    up + down as total_votes
+                FROM ratings_daily
+                WHERE restaurant_id = ANY(%s) AND meal_date = %s
+            """, (list(restaurant_ids), meal_date))
+
+            top_pick = None
+            for row in cur.fetchall():
+                score = row['score'] or 0
+                summaries[row['restaurant_id']][row['meal_name']] = {
+                    'up': row['up'] or 0,
+                    'down': row['down'] or 0,
+                    'score': score
+                }
+                # Same ordering as get_top_pick: positive score first, then most votes
+                if score > 0 and (top_pick is None or
+                                  (score, row['total_votes']) > (top_pick['score'], top_pick['total_votes'])):
+                    top_pick = {
+                        'restaurant_id': row['restaurant_id'],
+                        'meal_name': row['meal_name'],
+                        'score': score,
+                        'total_votes': row['total_votes']
+                    }
+            return summaries, top_pick
+
+
+def rebuild_rollup(since: Optional[date] = None) -> Optional[int]:
+    """
+    Recompute ratings_daily from the raw ratings (backfill or repair).
+
+    Args:
+        since: Only rebuild days from this date on (defaults to all days)
+
+    Returns:
+        Number of rollup rows written, or None if the database is unavailable
+    """
+    with get_connection() as conn:
+        if conn is None:
+            return None
+
+        with conn.cursor() as cur:
+            # Hold off concurrent vote writes so none is counted twice or lost
+            cur.execute("LOCK TABLE ratings_daily IN EXCLUSIVE MODE")
+            date_filter = "WHERE meal_date >= %s" if since else ""
+            params = (since,) if since else ()
+            cur.execute(f"DELETE FROM ratings_daily {date_filter}", params)
+            cur.execute(f"""
+                INSERT INTO ratings_daily (restaurant_id, meal_date, meal_name, up, down, score)
+                SELECT
+                    restaurant_id,
+                    meal_date,
+                    meal_name,
+                    COUNT(*) FILTER (WHERE rating = 1),
+                    COUNT(*) FILTER (WHERE rating = -1),
+                    SUM(rating)
+                FROM ratings
+                {date_filter}
+                GROUP BY restaurant_id, meal_date, meal_name
+            """, params)
+            return cur.rowcount
+
+
+# Distinguishes the server-side cursors of concurrent streams on one connection pool
+_cursor_ids = itertools.count(1)
+
+
+def _stream_rows(query: str, params: tuple) -> Iterator[tuple]:
+    """
+    Run a query through a named (server-side) cursor and yield its rows.
+    Rows arrive STREAM_BATCH_SIZE at a time, so memory stays flat however
+    many rows match. The connection is held until the generator is exhausted
+    or closed (e.g. when the client disconnects).
+    """
+    with get_connection() as conn:
+        if conn is None:
+            return
+        with conn.cursor(name=f"stream_{os.getpid()}_{next(_cursor_ids)}") as cur:
+            cur.itersize = STREAM_BATCH_SIZE
+            cur.execute(query, params)
+            yield from cur
+
+
+def iter_ratings_history(start: date, end: date, restaurant_id: Optional[str] = None) -> Iterator[tuple]:
+    """
+    Stream the daily per-meal counters of a date range from the rollup.
+
+    Args:
+        start: First day (inclusive)
+        end: Last day (inclusive)
+        restaurant_id: Only this restaurant (defaults to all)
+
+    Returns:
+        Iterator of HISTORY_COLUMNS tuples ordered by day, restaurant and meal;
+        empty if the database is unavailable
+    """
+    restaurant_filter = "AND restaurant_id = %s" if restaurant_id else ""
+    params = (start, end, restaurant_id) if restaurant_id else (start, end)
+    return _stream_rows(f"""
+        SELECT {', '.join(HISTORY_COLUMNS)}
+        FROM ratings_daily
+        WHERE meal_date BETWEEN %s AND %s {restaurant_filter}
+        ORDER BY meal_date, restaurant_id, meal_name
+    """, params)
+
+
+def iter_ratings(start: date, end: date, restaurant_id: Optional[str] = None) -> Iterator[tuple]:
+    """
+    Stream the raw votes of a date range (for bulk export).
+
+    Args:
+        start: First day (inclusive)
+        end: Last day (inclusive)
+        restaurant_id: Only this restaurant (defaults to all)
+
+    Returns:
+        Iterator of RATING_COLUMNS tuples in storage order (votes are
+        appended, so roughly chronological); empty if the database is unavailable
+    """
+    restaurant_filter = "AND restaurant_id = %s" if restaurant_id else ""
+    params = (start, end, restaurant_id) if restaurant_id else (start, end)
+    # No ORDER BY: the rows stream as the shards produce them instead of after a full sort
+    return _stream_rows(f"""
+        SELECT {', '.join(RATING_COLUMNS)}
+        FROM ratings
+        WHERE meal_date BETWEEN %s AND %s {restaurant_filter}
+    """, params)
+
+
+def get_translations(text_hashes: list, source_lang: str, target_lang: str) -> dict:
+    """
+    Look up cached translations.
+
+    Args:
+        text_hashes: SHA-256 hex digests of the source texts
+        source_lang: Source language code
+        target_lang: Target language code
+
+    Returns:
+        Dict mapping text_hash to translated text for the hashes found
+    """
+    if not text_hashes:
+        return {}
+
+    with get_connection() as conn:
+        if conn is None:
+            return {}
+
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT text_hash, translated_text
+                FROM translations
+                WHERE source_lang = %s AND target_lang = %s AND text_hash = ANY(%s)
+            """, (source_lang, target_lang, list(text_hashes)))
+            return dict(cur.fetchall())
+
+
+def save_translations(translations: dict, source_lang: str, target_lang: str) -> bool:
+    """
+    Store translations, keeping any existing entry for the same key.
+
+    Args:
+        translations: Dict mapping text_hash to translated text
+        source_lang: Source language code
+        target_lang: Target language code
+
+    Returns:
+        True if the translations were written
+    """
+    if not translations:
+        return True
+
+    with get_connection() as conn:
+        if conn is None:
+            return False
+
+        with conn.cursor() as cur:
+            from psycopg2.extras import execute_values
+            execute_values(cur, """
+                INSERT INTO translations (text_hash, source_lang, target_lang, translated_text)
+                VALUES %s
+                ON CONFLICT DO NOTHING
+            """, [(text_hash, source_lang, target_lang, text) for text_hash, text in translations.items()])
+            return True
+
+
 def close_pool():
-    """Close the connection pool."""
-    global _pool
-    if _pool:
-        _pool.closeall()
-        _pool = None
+    """Close the connection pool and reset the breaker (stopping any background probe)."""
+    global _pool, _probe_generation
+    with _locks()['pool']:
+        _probe_generation += 1
+        _breaker.update(state='closed', failures=0, backoff=BREAKER_BACKOFF_SECONDS, retry_at=0.0)
+        closing, _pool = _pool, None
+    if closing:
+        closing.closeall()
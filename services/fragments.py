@@ -0,0 +1,139 @@
+"""
+Fragment cache for the index page.
+The page is assembled from separately cached pieces: the page shell per
+(language, date), each restaurant's menu card per (restaurant, language,
+menu version) and its rating counts per (restaurant, ratings version).
+Cards are rendered once with placeholder slots where the counts and the
+top-pick marker go and kept as static chunks, so filling in new counts is a
+string join: a vote re-reads and re-renders one restaurant's counts only.
+"""
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+from markupsafe import Markup
+
+# Fragments kept in memory (shells, menu cards and counts together)
+MAX_ENTRIES = int(os.getenv('FRAGMENT_CACHE_SIZE', '256'))
+
+# Upper bound on how long rating counts are reused, so votes recorded by other
+# workers or instances show up without a local invalidation
+COUNTS_TTL_SECONDS = float(os.getenv('FRAGMENT_COUNTS_TTL_SECONDS', '30'))
+
+# How long a menu card with untranslated text (Translator down or unconfigured)
+# is reused before translating it is tried again
+INCOMPLETE_TTL_SECONDS = float(os.getenv('FRAGMENT_INCOMPLETE_TTL_SECONDS', '30'))
+
+# Wraps slot numbers in rendered output, together with a random token per
+# compile, so text that happens to contain the marker (scraped menus are not
+# escaped for it) stays part of the static chunks
+_MARK = '\x00'
+
+_lock = threading.Lock()
+
+# key -> (value, expires_at or None); the first element of every key names the fragment kind
+_fragments: OrderedDict = OrderedDict()
+
+# kind -> {'hits': int, 'misses': int}
+_stats: Dict[str, dict] = {}
+
+
+def compile_slots(render: Callable[[Callable[..., Markup]], str]) -> dict:
+    """
+    Render a template with placeholder slots and split it into static chunks.
+
+    Args:
+        render: Renders the template; gets a slot(kind, name=None) function to
+            call wherever per-request values go
+
+    Returns:
+        Dict with 'chunks' (static HTML) and 'slots' ((kind, name) between
+        consecutive chunks), to be passed to fill()
+    """
+    slots = []
+    token = secrets.token_hex(8)
+
+    def slot(kind: str, name: Optional[str] = None) -> Markup:
+        slots.append((kind, name))
+        return Markup(f"{_MARK}{token}:{len(slots) - 1}{_MARK}")
+
+    parts = re.split(f"{_MARK}{token}:(\\d+){_MARK}", render(slot))
+    return {
+        'chunks': parts[0::2],
+        'slots': [slots[int(index)] for index in parts[1::2]],
+    }
+
+
+def fill(fragment: dict, values: Dict[tuple, str]) -> str:
+    """Join a compiled fragment's chunks with the values of its slots (empty when missing)."""
+    chunks = fragment['chunks']
+    parts = [chunks[0]]
+    for slot, chunk in zip(fragment['slots'], chunks[1:]):
+        parts.append(values.get(slot, ''))
+        parts.append(chunk)
+    return ''.join(parts)
+
+
+def lookup(key: tuple):
+    """Get a cached fragment (None when missing or expired), counting a hit or miss for its kind."""
+    now = time.time()
+    with _lock:
+        counters = _stats.setdefault(key[0], {'hits': 0, 'misses': 0})
+        cached = _fragments.get(key)
+        if cached is not None and (cached[1] is None or now < cached[1]):
+            _fragments.move_to_end(key)
+            counters['hits'] += 1
+            return cached[0]
+        counters['misses'] += 1
+        return None
+
+
+def store(key: tuple, value, ttl: Optional[float] = None):
+    """
+    Cache a fragment.
+
+    Args:
+        key: Cache key starting with the fragment kind (e.g. 'menu'), followed
+            by everything the fragment depends on
+        value: The fragment
+        ttl: Seconds the fragment may be reused (forever if None)
+    """
+    expires_at = time.time() + ttl if ttl is not None else None
+    with _lock:
+        _fragments[key] = (value, expires_at)
+        _fragments.move_to_end(key)
+        while len(_fragments) > MAX_ENTRIES:
+            _fragments.popitem(last=False)
+
+
+def get(key: tuple, build: Callable[[], object], ttl: Optional[float] = None):
+    """Get a cached fragment, building and storing it (see store) on a miss."""
+    value = lookup(key)
+    if value is None:
+        value = build()
+        store(key, value, ttl)
+    return value
+
+
+def peek(key: tuple):
+    """Get a cached fragment without counting or building it (None when missing or expired)."""
+    with _lock:
+        cached = _fragments.get(key)
+    if cached is None or (cached[1] is not None and time.time() >= cached[1]):
+        return None
+    return cached[0]
+
+
+def stats() -> dict:
+    """Hit and miss counters per fragment kind."""
+    with _lock:
+        return {'entries': len(_fragments), 'kinds': {kind: dict(counters) for kind, counters in _stats.items()}}
+
+
+def clear():
+    """Drop every cached fragment."""
+    with _lock:
+        _fragments.clear()
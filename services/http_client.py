@@ -0,0 +1,89 @@
+"""
+Shared HTTP client for the menu scrapers.
+Keeps connections alive across fetches and sends conditional requests
+(If-None-Match / If-Modified-Since) using the validators of the last response.
+"""
+import threading
+from typing import TYPE_CHECKING, Dict, Optional, Union
+
+if TYPE_CHECKING:
+    import requests
+
+# Global session instance (requests is only imported when the first fetch runs)
+_session: Optional['requests.Session'] = None
+_session_lock = threading.Lock()
+
+# Validators and body of the last successful response per URL
+_validators: Dict[str, dict] = {}
+
+
+class NotModified:
+    """
+    Returned instead of a body when the server answered 304 Not Modified.
+    Carries the body of the previous response so callers can still re-parse it.
+    """
+
+    def __init__(self, content: Union[bytes, str]):
+        self.content = content
+
+
+def get_session() -> 'requests.Session':
+    """Get or create the keep-alive session singleton."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def conditional_get(url: str, timeout: float, as_text: bool = False) -> Union[bytes, str, NotModified]:
+    """
+    GET a URL, revalidating against the previous response when possible.
+
+    Args:
+        url: The URL to fetch
+        timeout: Request timeout in seconds
+        as_text: Return the decoded text instead of raw bytes
+
+    Returns:
+        The response body, or NotModified wrapping the cached body on a 304
+    """
+    cached = _validators.get(url)
+    headers = {}
+    if cached:
+        if cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached['last_modified']:
+            headers['If-Modified-Since'] = cached['last_modified']
+
+    response = get_session().get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304 and cached:
+        return NotModified(cached['body'])
+    response.raise_for_status()
+
+    body = response.text if as_text else response.content
+
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if etag or last_modified:
+        _validators[url] = {
+            'etag': etag,
+            'last_modified': last_modified,
+            'body': body,
+        }
+    else:
+        _validators.pop(url, None)
+
+    return body
+
+
+def clear_validators():
+    """Forget all stored validators so the next fetches download full bodies."""
+    _validators.clear()
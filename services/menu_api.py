@@ -0,0 +1,128 @@
+"""
+Serialized, precompressed responses for the JSON menu API.
+Menus are normalized to one meal shape, serialized once per
+(language, date, menu version, translation generation) and stored as raw,
+gzip and (when the brotli package is installed) brotli bytes, so repeat
+requests are a dictionary lookup and a 304 or a copy of ready bytes.
+Responses with untranslated text are only kept for a short while, so they
+are rebuilt once the Translator is reachable again.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Tuple
+from flask import Request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Serialized responses kept in memory
+MAX_ENTRIES = int(os.getenv('MENU_API_CACHE_SIZE', '64'))
+
+# How long clients and proxies may reuse a response without revalidating
+MAX_AGE_SECONDS = int(os.getenv('MENU_API_MAX_AGE_SECONDS', '60'))
+
+# How long a response with untranslated text is reused (here and by clients)
+INCOMPLETE_TTL_SECONDS = int(os.getenv('MENU_API_INCOMPLETE_TTL_SECONDS', '30'))
+
+_lock = threading.Lock()
+_responses: OrderedDict = OrderedDict()
+
+_stats = {'hits': 0, 'misses': 0, 'not_modified': 0}
+
+
+def normalize_meal(meal: dict) -> dict:
+    """
+    Unify the scrapers' meal shapes to {'label', 'description'}.
+    ISS and Nest meals have a label and a description; Compass meals only a
+    name, which becomes the description.
+    """
+    if 'name' in meal and 'description' not in meal:
+        return {'label': None, 'description': meal['name']}
+    return {'label': meal.get('label'), 'description': meal.get('description')}
+
+
+def _encode(payload: dict, complete: bool) -> dict:
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    entry = {
+        'identity': body,
+        'gzip': gzip.compress(body, compresslevel=9),
+        'etag': hashlib.sha1(body).hexdigest(),
+        'expires_at': None if complete else time.time() + INCOMPLETE_TTL_SECONDS,
+        'max_age': MAX_AGE_SECONDS if complete else min(MAX_AGE_SECONDS, INCOMPLETE_TTL_SECONDS),
+    }
+    if brotli is not None:
+        entry['br'] = brotli.compress(body, quality=11)
+    return entry
+
+
+def get(key: tuple, build: Callable[[], Tuple[dict, bool]]) -> dict:
+    """
+    Get the encoded response for a key, building and compressing it on a miss.
+
+    Args:
+        key: Cache key (include everything the payload depends on)
+        build: Returns the JSON-serializable payload and whether it is
+            complete (False keeps it for INCOMPLETE_TTL_SECONDS only)
+    """
+    now = time.time()
+    with _lock:
+        entry = _responses.get(key)
+        if entry is not None and (entry['expires_at'] is None or now < entry['expires_at']):
+            _responses.move_to_end(key)
+            _stats['hits'] += 1
+            return entry
+        _stats['misses'] += 1
+
+    entry = _encode(*build())
+    with _lock:
+        _responses[key] = entry
+        _responses.move_to_end(key)
+        while len(_responses) > MAX_ENTRIES:
+            _responses.popitem(last=False)
+    return entry
+
+
+def _pick_encoding(request: Request, entry: dict) -> str:
+    accepted = request.accept_encodings
+    if 'br' in entry and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return 'identity'
+
+
+def respond(entry: dict, request: Request) -> Response:
+    """Send the best stored encoding for the client, answering If-None-Match with 304."""
+    encoding = _pick_encoding(request, entry)
+    response = Response(entry[encoding], mimetype='application/json')
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    # Each encoding is a different byte sequence, so it gets its own strong ETag
+    response.set_etag(entry['etag'] if encoding == 'identity' else f"{entry['etag']}-{encoding}")
+    response.headers['Cache-Control'] = f"public, max-age={entry['max_age']}"
+    response.vary.add('Accept-Encoding')
+    response.vary.add('Accept-Language')
+    response.make_conditional(request)
+    if response.status_code == 304:
+        with _lock:
+            _stats['not_modified'] += 1
+    return response
+
+
+def stats() -> dict:
+    """Hit, miss and 304 counters."""
+    with _lock:
+        return dict(_stats, entries=len(_responses), brotli=brotli is not None)
+
+
+def clear():
+    """Drop every stored response."""
+    with _lock:
+        _responses.clear()
@@ -0,0 +1,478 @@
+"""
+In-memory menu store filled by a background refresher.
+Page views only read from the store; scraping happens on a schedule with a
+configurable time-to-live per restaurant. Sources are scraped concurrently on
+a shared thread pool under a single deadline.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional
+from services import metrics
+from services.http_client import NotModified
+
+# Default time-to-live for a scraped menu, overridable per restaurant with
+# MENU_TTL_<RESTAURANT_ID> (e.g. MENU_TTL_COMPASS=600)
+DEFAULT_TTL_SECONDS = int(os.getenv('MENU_TTL_SECONDS', '900'))
+
+# How soon to retry a source whose last refresh failed
+RETRY_SECONDS = int(os.getenv('MENU_RETRY_SECONDS', '60'))
+
+# Overall time budget for a batch of concurrent scrapes
+DEADLINE_SECONDS = float(os.getenv('MENU_DEADLINE_SECONDS', '3'))
+
+# How often the refresher wakes up to look for expired entries
+TICK_SECONDS = 5
+
+# Poll interval inside a source's publish window (when its menu usually changes)
+FAST_SECONDS = int(os.getenv('MENU_FAST_SECONDS', '120'))
+
+# Poll interval outside the publish window once today's menu is loaded
+IDLE_SECONDS = int(os.getenv('MENU_IDLE_SECONDS', '3600'))
+
+# Hours (server local time, inclusive) assumed to be the publish window until
+# enough real changes have been observed to learn each source's own
+DEFAULT_PUBLISH_HOURS = tuple(int(hour) for hour in os.getenv('MENU_PUBLISH_HOURS', '6-10').split('-'))
+
+# Observed changes needed before the learned window replaces the default
+MIN_OBSERVATIONS = 3
+
+# Observed changes remembered per source
+CHANGE_HISTORY = 30
+
+_lock = threading.Lock()
+_sources: Dict[str, dict] = {}
+_entries: Dict[str, dict] = {}
+_version = 0
+
+# Earliest time a failed source may be retried
+_retry_at: Dict[str, float] = {}
+
+# Timings and errors of the most recent refresh attempt per source
+_last_attempt: Dict[str, dict] = {}
+
+# Callbacks notified with (restaurant_id, days, entry_version) when a menu is replaced
+_listeners: List[Callable[[str, Dict[date, list], int], None]] = []
+
+# Callbacks notified with (restaurant_id, days, entry_version) when an unchanged
+# menu moves to new dates (a single-day source re-serving it after midnight)
+_redate_listeners: List[Callable[[str, Dict[date, list], int], None]] = []
+
+# (weekday, hour) of the most recent real content changes per source
+_changes: Dict[str, deque] = {}
+
+# Scrapes currently running, so concurrent callers share one fetch per source
+_in_flight: Dict[str, Future] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+
+_refresher: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def register_source(restaurant_id: str, fetch: Callable[[], object],
+                    parse: Callable[[object], list], ttl: Optional[int] = None):
+    """
+    Register a scraper for a restaurant.
+
+    Args:
+        restaurant_id: The restaurant identifier
+        fetch: Callable downloading the raw menu document, or returning
+            NotModified when the upstream copy hasn't changed
+        parse: Callable turning the raw document into today's list of meal dicts,
+            or into a dict mapping dates to meal lists for sources that publish
+            several days at once
+        ttl: Seconds a scraped menu stays fresh (defaults to MENU_TTL_<ID> or MENU_TTL_SECONDS)
+    """
+    if ttl is None:
+        ttl = int(os.getenv(f'MENU_TTL_{restaurant_id.upper()}', DEFAULT_TTL_SECONDS))
+    with _lock:
+        _sources[restaurant_id] = {'fetch': fetch, 'parse': parse, 'ttl': ttl}
+
+
+def add_listener(callback: Callable[[str, Dict[date, list], int], None]):
+    """
+    Register a callback run after a restaurant's menu is replaced.
+    Called on the scraping thread with (restaurant_id, days, entry_version).
+    """
+    _listeners.append(callback)
+
+
+def add_redate_listener(callback: Callable[[str, Dict[date, list], int], None]):
+    """
+    Register a callback run when an unchanged menu is stored under new dates.
+    The entry version stays the same, so anything keyed by date (pre-translated
+    variants, snapshots) has to follow; called with the same arguments as
+    add_listener callbacks.
+    """
+    _redate_listeners.append(callback)
+
+
+def _notify(listeners: list, restaurant_id: str, days: Dict[date, list], version: int):
+    for callback in listeners:
+        try:
+            callback(restaurant_id, days, version)
+        except Exception as e:
+            print(f"Menu listener failed for {restaurant_id}: {e}")
+
+
+def get_menu(restaurant_id: str, day: Optional[date] = None) -> list:
+    """
+    Get a restaurant's menu for a day (defaults to today) from the store.
+    Never scrapes; returns an empty list until the refresher has filled the entry
+    or if the source didn't publish a menu for that day.
+    """
+    entry = _entries.get(restaurant_id)
+    if entry is None:
+        return []
+    return entry['days'].get(day or date.today(), [])
+
+
+def get_days(restaurant_id: str) -> Dict[date, list]:
+    """Get every dated menu the store holds for a restaurant (e.g. the ISS week)."""
+    entry = _entries.get(restaurant_id)
+    return dict(entry['days']) if entry else {}
+
+
+def has_menu(restaurant_id: str) -> bool:
+    """Check whether the store holds today's menu for a restaurant."""
+    entry = _entries.get(restaurant_id)
+    if entry is None:
+        return False
+    today = date.today()
+    return entry['menu_date'] == today or today in entry['days']
+
+
+def menu_version() -> int:
+    """Counter bumped every time a menu in the store is replaced."""
+    return _version
+
+
+def entry_version(restaurant_id: str) -> Optional[int]:
+    """Value of menu_version() when a restaurant's current menu was stored."""
+    entry = _entries.get(restaurant_id)
+    return entry['version'] if entry else None
+
+
+def is_due(restaurant_id: str, now: Optional[float] = None) -> bool:
+    """Check whether a restaurant's entry is missing, expired or from a previous day."""
+    if now is None:
+        now = time.time()
+    if _retry_at.get(restaurant_id, 0) > now:
+        return False
+    entry = _entries.get(restaurant_id)
+    if entry is None or entry['menu_date'] != date.today():
+        return True
+    return entry['expires_at'] <= now
+
+
+def refresh(restaurant_id: str) -> bool:
+    """
+    Scrape a single restaurant and store the result.
+
+    Returns:
+        True if the menu was refreshed, False if the scraper failed
+        (the previous menu is kept in that case)
+    """
+    global _version
+    source = _sources[restaurant_id]
+    attempt = {'started_at': time.time(), 'fetch_ms': None, 'parse_ms': None,
+               'not_modified': False, 'unchanged': False, 'error': None}
+    _last_attempt[restaurant_id] = attempt
+    entry = _entries.get(restaurant_id)
+
+    try:
+        started = time.perf_counter()
+        content = source['fetch']()
+        fetched = time.perf_counter()
+        attempt['fetch_ms'] = round((fetched - started) * 1000, 1)
+        metrics.observe('menu_fetch_seconds', fetched - started, source=restaurant_id)
+
+        if isinstance(content, NotModified):
+            attempt['not_modified'] = True
+            today = date.today()
+            if entry is not None and (entry['menu_date'] == today or today in entry['days']):
+                # Unchanged upstream and today is already parsed: just schedule the next check
+                entry['menu_date'] = today
+                entry['checked_at'] = time.time()
+                entry['expires_at'] = entry['checked_at'] + _next_interval(restaurant_id, entry['checked_at'])
+                _retry_at.pop(restaurant_id, None)
+                return True
+            # Parsers pick today's entry, so an unchanged page still needs
+            # re-parsing after the day rolls over
+            content = content.content
+
+        days = source['parse'](content)
+        if not isinstance(days, dict):
+            days = {date.today(): days}
+        attempt['parse_ms'] = round((time.perf_counter() - fetched) * 1000, 1)
+        metrics.observe('menu_parse_seconds', time.perf_counter() - fetched, source=restaurant_id)
+    except Exception as e:
+        print(f"Menu refresh failed for {restaurant_id}: {e}")
+        metrics.inc('menu_refresh_failures_total', source=restaurant_id)
+        attempt['error'] = str(e)
+        _retry_at[restaurant_id] = time.time() + min(RETRY_SECONDS, source['ttl'])
+        return False
+
+    now = time.time()
+    digest = _content_hash(days)
+    if entry is not None and entry.get('hash') == digest:
+        # The page was re-fetched but the menu is the same (single-day sources
+        # only moved to a new date): keep the version so cached pages and
+        # translations stay valid, and don't count it as a publish
+        attempt['unchanged'] = True
+        redated = set(entry['days']) != set(days)
+        with _lock:
+            entry['days'] = days
+            entry['menu_date'] = date.today()
+            entry['checked_at'] = now
+            entry['expires_at'] = now + _next_interval(restaurant_id, now)
+            _retry_at.pop(restaurant_id, None)
+        if redated:
+            _notify(_redate_listeners, restaurant_id, days, entry['version'])
+        return True
+
+    # A snapshot restored at startup may be days old, so replacing it says nothing about the schedule
+    if entry is not None and not entry.get('restored'):
+        _record_change(restaurant_id, now)
+    with _lock:
+        _entries[restaurant_id] = {
+            'days': days,
+            'hash': digest,
+            'menu_date': date.today(),
+            'fetched_at': now,
+            'checked_at': now,
+            'expires_at': now,
+            'version': _version + 1,
+        }
+        # Depends on the new entry (weekly or not, today's menu loaded or not)
+        _entries[restaurant_id]['expires_at'] = now + _next_interval(restaurant_id, now)
+        _retry_at.pop(restaurant_id, None)
+        _version += 1
+        version = _version
+
+    _notify(_listeners, restaurant_id, days, version)
+    return True
+
+
+def restore(restaurant_id: str, days: Dict[date, list], fetched_at: float) -> bool:
+    """
+    Fill an empty entry from a saved snapshot (e.g. at startup).
+    The entry keeps its original age, so an old snapshot is due for refresh
+    right away but is served until a scrape replaces it.
+
+    Returns:
+        True if the snapshot was stored, False if the source already has an entry
+    """
+    global _version
+    source = _sources[restaurant_id]
+    with _lock:
+        if restaurant_id in _entries:
+            return False
+        _entries[restaurant_id] = {
+            'days': days,
+            'hash': _content_hash(days),
+            'menu_date': date.fromtimestamp(fetched_at),
+            'fetched_at': fetched_at,
+            'checked_at': fetched_at,
+            'expires_at': fetched_at + source['ttl'],
+            'version': _version + 1,
+            'restored': True,
+        }
+        _version += 1
+        version = _version
+
+    _notify(_listeners, restaurant_id, days, version)
+    return True
+
+
+def _content_hash(days: Dict[date, list]) -> str:
+    """
+    Hash of the normalized meals in date order, independent of the upstream
+    document's markup and of the dates themselves (single-day sources are
+    keyed by whatever day they were parsed on).
+    """
+    meals = [days[day] for day in sorted(days)]
+    return hashlib.sha1(json.dumps(meals, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _record_change(restaurant_id: str, now: float):
+    local = time.localtime(now)
+    _changes.setdefault(restaurant_id, deque(maxlen=CHANGE_HISTORY)).append((local.tm_wday, local.tm_hour))
+
+
+def in_publish_window(restaurant_id: str, now: Optional[float] = None) -> bool:
+    """
+    Check whether a source is likely to publish or correct its menu around now.
+    Uses the hours (for weekly sources: weekday and hour) of its observed
+    changes, plus or minus an hour, falling back to DEFAULT_PUBLISH_HOURS.
+    """
+    if now is None:
+        now = time.time()
+    local = time.localtime(now)
+    observed = _changes.get(restaurant_id, ())
+    hours = set()
+    if len(observed) < MIN_OBSERVATIONS:
+        first, last = DEFAULT_PUBLISH_HOURS[0], DEFAULT_PUBLISH_HOURS[-1]
+        hours.update(range(first, last + 1))
+
+    entry = _entries.get(restaurant_id)
+    # A source publishing several days at once (ISS) changes on particular weekdays only
+    weekly = entry is not None and len(entry['days']) > 1
+    for weekday, hour in observed:
+        if weekly and weekday != local.tm_wday:
+            continue
+        hours.update(((hour - 1) % 24, hour, (hour + 1) % 24))
+    return local.tm_hour in hours
+
+
+def _next_interval(restaurant_id: str, now: float) -> float:
+    """Seconds until a source should be checked again."""
+    ttl = _sources[restaurant_id]['ttl']
+    if in_publish_window(restaurant_id, now):
+        return min(FAST_SECONDS, ttl)
+    if has_menu(restaurant_id):
+        return max(ttl, IDLE_SECONDS)
+    return ttl
+
+
+def _is_refreshing(restaurant_id: str) -> bool:
+    future = _in_flight.get(restaurant_id)
+    return future is not None and not future.done()
+
+
+def _submit(restaurant_id: str) -> Future:
+    """Start a refresh for a source, or join the one already running."""
+    global _executor
+    with _lock:
+        future = _in_flight.get(restaurant_id)
+        if future is not None and not future.done():
+            return future
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(len(_sources), 1),
+                thread_name_prefix='menu-scrape',
+            )
+        future = _executor.submit(refresh, restaurant_id)
+        _in_flight[restaurant_id] = future
+    return future
+
+
+def refresh_many(restaurant_ids: Iterable[str], deadline: Optional[float] = None) -> Dict[str, str]:
+    """
+    Scrape several restaurants concurrently under one overall deadline.
+    Sources that miss the deadline keep running in the background and are
+    reported as 'pending' instead of holding up the caller.
+
+    Returns:
+        Dict mapping restaurant_id to 'ok', 'failed' or 'pending'
+    """
+    if deadline is None:
+        deadline = DEADLINE_SECONDS
+    futures = {restaurant_id: _submit(restaurant_id) for restaurant_id in restaurant_ids}
+    wait(futures.values(), timeout=deadline)
+
+    results = {}
+    for restaurant_id, future in futures.items():
+        if not future.done():
+            results[restaurant_id] = 'pending'
+        elif future.exception() is None and future.result():
+            results[restaurant_id] = 'ok'
+        else:
+            results[restaurant_id] = 'failed'
+    return results
+
+
+def ensure_fresh(restaurant_ids: Iterable[str], deadline: Optional[float] = None) -> Dict[str, str]:
+    """
+    Make sure today's menu is loaded for the given restaurants.
+    Only sources missing from the store are scraped, bounded by the deadline;
+    sources still backing off after a failure are reported as 'failed' and
+    sources that already have today's menu as 'ok', both without waiting.
+    """
+    results = {}
+    missing = []
+    now = time.time()
+    for restaurant_id in restaurant_ids:
+        if has_menu(restaurant_id):
+            results[restaurant_id] = 'ok'
+        elif _is_refreshing(restaurant_id) or is_due(restaurant_id, now):
+            missing.append(restaurant_id)
+        else:
+            results[restaurant_id] = 'failed'
+    if missing:
+        results.update(refresh_many(missing, deadline))
+    return results
+
+
+def refresh_due():
+    """Refresh every registered restaurant whose entry is due."""
+    now = time.time()
+    due = [restaurant_id for restaurant_id in list(_sources) if is_due(restaurant_id, now)]
+    if due:
+        refresh_many(due)
+
+
+def status() -> Dict[str, dict]:
+    """
+    Report the state of every source for monitoring.
+
+    Returns:
+        Dict mapping restaurant_id to freshness, item count and the fetch/parse
+        durations (milliseconds) of the most recent refresh attempt
+    """
+    now = time.time()
+    report = {}
+    for restaurant_id, source in _sources.items():
+        entry = _entries.get(restaurant_id)
+        attempt = _last_attempt.get(restaurant_id, {})
+        report[restaurant_id] = {
+            'loaded': has_menu(restaurant_id),
+            'refreshing': _is_refreshing(restaurant_id),
+            'items': len(get_menu(restaurant_id)),
+            'days': sorted(day.isoformat() for day in entry['days']) if entry else [],
+            'age_seconds': round(now - entry['fetched_at'], 1) if entry else None,
+            'from_snapshot': bool(entry and entry.get('restored')),
+            'ttl_seconds': source['ttl'],
+            'fetch_ms': attempt.get('fetch_ms'),
+            'parse_ms': attempt.get('parse_ms'),
+            'not_modified': attempt.get('not_modified', False),
+            'unchanged': attempt.get('unchanged', False),
+            'error': attempt.get('error'),
+            'changes_seen': len(_changes.get(restaurant_id, ())),
+            'publish_window': in_publish_window(restaurant_id, now),
+            'next_check_seconds': round(max(0.0, entry['expires_at'] - now), 1) if entry else None,
+        }
+    return report
+
+
+def _run():
+    while not _stop.is_set():
+        refresh_due()
+        _stop.wait(TICK_SECONDS)
+
+
+def start_refresher():
+    """Start the background refresher thread (no-op if it is already running)."""
+    global _refresher
+    if _refresher is not None and _refresher.is_alive():
+        return
+    with _lock:
+        if _refresher is not None and _refresher.is_alive():
+            return
+        _stop.clear()
+        _refresher = threading.Thread(target=_run, name='menu-refresher', daemon=True)
+        _refresher.start()
+
+
+def stop_refresher():
+    """Stop the background refresher thread."""
+    global _refresher
+    _stop.set()
+    if _refresher is not None:
+        _refresher.join(timeout=TICK_SECONDS)
+        _refresher = None
@@ -0,0 +1,181 @@
+"""
+Lightweight request timing and Prometheus metrics.
+Stages wrapped in timed() are added to the current request's Server-Timing
+header and, when given a metric name, to a histogram. /metrics renders the
+histograms, counters and registered gauges in the Prometheus text format.
+Recording is a perf_counter call and a few dict updates under a lock.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+from flask import g, has_request_context
+
+# Set to 'false' to skip all recording (timed() becomes a bare yield)
+ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'http_request_seconds': 'Time to handle a request',
+    'menu_fetch_seconds': 'Time to fetch a menu source',
+    'menu_parse_seconds': 'Time to parse a menu source',
+    'translation_seconds': 'Time spent translating menus on the request path',
+    'db_query_seconds': 'Time a database connection was held',
+    'db_checkout_wait_seconds': 'Time waiting for a free database connection',
+    'render_seconds': 'Time to render the index template',
+    'vote_rejections_total': 'Votes turned away by admission control',
+}
+
+_lock = threading.Lock()
+
+# (name, labels) -> [bucket counts..., +Inf count, sum]
+_histograms: Dict[tuple, list] = {}
+_counters: Dict[tuple, float] = {}
+
+# Callables returning [(name, type, labels dict, value)] evaluated on every scrape
+_collectors: List[Callable[[], Iterable[tuple]]] = []
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name: str, seconds: float, **labels):
+    """Add a duration to a histogram."""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[index] += 1
+                break
+        else:
+            histogram[len(BUCKETS)] += 1
+        histogram[-1] += seconds
+
+
+def inc(name: str, amount: float = 1, **labels):
+    """Increase a counter."""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def record(stage: str, seconds: float, metric: Optional[str] = None, **labels):
+    """
+    Record a measured stage.
+
+    Args:
+        stage: Server-Timing entry of the current request (durations of the same stage add up)
+        seconds: Measured duration
+        metric: Histogram to add the duration to, if any
+        labels: Histogram labels
+    """
+    if not ENABLED:
+        return
+    if metric:
+        observe(metric, seconds, **labels)
+    if has_request_context():
+        timings = g.setdefault('server_timing', {})
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage: str, metric: Optional[str] = None, **labels):
+    """Time the wrapped block as a Server-Timing stage (and histogram, if given)."""
+    if not ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started, metric, **labels)
+
+
+def server_timing_header() -> Optional[str]:
+    """Server-Timing header value for the stages recorded in the current request."""
+    timings = g.get('server_timing')
+    if not timings:
+        return None
+    return ', '.join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+
+def add_collector(collector: Callable[[], Iterable[tuple]]):
+    """
+    Register a callable reporting values computed at scrape time.
+
+    The callable returns (name, type, labels, value) tuples, where type is
+    'gauge' or 'counter' and labels a dict.
+    """
+    _collectors.append(collector)
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {key: list(values) for key, values in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = []
+    declared = set()
+
+    def declare(name: str, metric_type: str):
+        if name not in declared:
+            declared.add(name)
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+    for (name, labels), values in sorted(histograms.items()):
+        declare(name, 'histogram')
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), values[:-1]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {values[-1]:.6f}")
+        lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+
+    for (name, labels), value in sorted(counters.items()):
+        declare(name, 'counter')
+        lines.append(f"{name}{_labels(labels)} {value:g}")
+
+    for collector in _collectors:
+        try:
+            samples = list(collector())
+        except Exception as e:
+            print(f"Metrics collector failed: {e}")
+            continue
+        for name, metric_type, labels, value in samples:
+            if value is None:
+                continue
+            declare(name, metric_type)
+            lines.append(f"{name}{_labels(sorted(labels.items()))} {float(value):g}")
+
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Drop all recorded histograms and counters."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
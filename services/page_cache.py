@@ -0,0 +1,117 @@
+"""
+Rendered page cache for the index route.
+Keeps the rendered HTML per (language, date, menu version, ratings version)
+and serves it with a strong ETag, so repeat views skip Jinja and the database.
+Pages are assembled from the fragments in services/fragments.py, which track
+ratings versions per restaurant.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+from flask import Request, Response
+
+# Rendered pages kept in memory (5 languages x a few dates is plenty)
+MAX_ENTRIES = int(os.getenv('PAGE_CACHE_SIZE', '64'))
+
+# Upper bound on how long a page is reused, so votes recorded by other
+# workers or instances show up without a local invalidation
+TTL_SECONDS = float(os.getenv('PAGE_CACHE_TTL_SECONDS', '30'))
+
+_lock = threading.Lock()
+_pages: OrderedDict = OrderedDict()
+_ratings_version = 0
+
+# restaurant_id -> value of _ratings_version when its ratings last changed
+_restaurant_versions: Dict[str, int] = {}
+# Value of _ratings_version when every restaurant's ratings last changed
+_all_restaurants_version = 0
+
+_stats = {'hits': 0, 'misses': 0, 'not_modified': 0}
+
+
+def ratings_version(restaurant_id: Optional[str] = None) -> int:
+    """
+    Counter bumped whenever a rating is submitted in this process.
+
+    Args:
+        restaurant_id: Only count changes to this restaurant's ratings
+    """
+    if restaurant_id is None:
+        return _ratings_version
+    return max(_restaurant_versions.get(restaurant_id, 0), _all_restaurants_version)
+
+
+def bump_ratings_version(restaurant_ids: Optional[Iterable[str]] = None):
+    """
+    Invalidate every cached page that shows rating counts.
+
+    Args:
+        restaurant_ids: Restaurants whose ratings changed (all of them if None)
+    """
+    global _ratings_version, _all_restaurants_version
+    with _lock:
+        _ratings_version += 1
+        if restaurant_ids is None:
+            _all_restaurants_version = _ratings_version
+        else:
+            for restaurant_id in restaurant_ids:
+                _restaurant_versions[restaurant_id] = _ratings_version
+
+
+def get(key: tuple) -> Optional[dict]:
+    """Get a cached page ({'body': bytes, 'etag': str}) if it is still fresh."""
+    with _lock:
+        page = _pages.get(key)
+        if page is None or time.time() - page['created_at'] > TTL_SECONDS:
+            _stats['misses'] += 1
+            return None
+        _pages.move_to_end(key)
+        _stats['hits'] += 1
+        return page
+
+
+def put(key: tuple, html: str) -> dict:
+    """Cache a rendered page and return its cache entry."""
+    body = html.encode('utf-8')
+    page = {
+        'body': body,
+        'etag': hashlib.sha1(body).hexdigest(),
+        'created_at': time.time(),
+    }
+    with _lock:
+        _pages[key] = page
+        _pages.move_to_end(key)
+        while len(_pages) > MAX_ENTRIES:
+            _pages.popitem(last=False)
+    return page
+
+
+def respond(page: dict, request: Request) -> Response:
+    """
+    Build the response for a cached page, answering If-None-Match with 304.
+    Clients must revalidate every time, so a changed page is never served stale.
+    """
+    response = Response(page['body'], mimetype='text/html')
+    response.set_etag(page['etag'])
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Language')
+    response.make_conditional(request)
+    if response.status_code == 304:
+        with _lock:
+            _stats['not_modified'] += 1
+    return response
+
+
+def stats() -> dict:
+    """Hit, miss and 304 counters."""
+    with _lock:
+        return dict(_stats, entries=len(_pages))
+
+
+def clear():
+    """Drop every cached page."""
+    with _lock:
+        _pages.clear()
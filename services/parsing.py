@@ -0,0 +1,86 @@
+"""
+Parser backend for the menu scrapers.
+Builds BeautifulSoup trees with a configurable backend (html.parser or lxml)
+and, when enabled, only for the subtrees a scraper actually reads.
+"""
+import os
+from typing import TYPE_CHECKING, Optional, Union
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup, SoupStrainer
+
+# Parser backend: 'html.parser' (pure Python, always available) or 'lxml' (faster, C extension)
+HTML_PARSER = os.getenv('HTML_PARSER', 'html.parser')
+
+# Restrict parsing to the subtrees each scraper needs (set to 'false' to build full trees)
+RESTRICT_PARSING = os.getenv('HTML_PARSE_ONLY', 'true').lower() == 'true'
+
+_backend: Optional[str] = None
+
+
+def available_backends() -> list:
+    """List the parser backends usable in this environment."""
+    backends = ['html.parser']
+    try:
+        import lxml  # noqa: F401
+        backends.append('lxml')
+    except ImportError:
+        pass
+    return backends
+
+
+def get_backend() -> str:
+    """Get the configured parser backend, falling back to html.parser if it isn't installed."""
+    global _backend
+    if _backend is None:
+        if HTML_PARSER in available_backends():
+            _backend = HTML_PARSER
+        else:
+            print(f"Parser backend '{HTML_PARSER}' not available, using html.parser")
+            _backend = 'html.parser'
+    return _backend
+
+
+class Strainer:
+    """
+    SoupStrainer arguments, turned into a real SoupStrainer on first use so
+    that defining one at import time doesn't import bs4.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._args = args
+        self._kwargs = kwargs
+        self._strainer = None
+
+    def get(self) -> 'SoupStrainer':
+        if self._strainer is None:
+            from bs4 import SoupStrainer
+            self._strainer = SoupStrainer(*self._args, **self._kwargs)
+        return self._strainer
+
+
+def make_soup(content, parse_only: Optional[Union[Strainer, 'SoupStrainer']] = None,
+              backend: Optional[str] = None) -> 'BeautifulSoup':
+    """
+    Parse a document with the configured backend.
+
+    Args:
+        content: Raw bytes or decoded text of the document
+        parse_only: Strainer limiting the tree to matching top-level elements
+            (ignored when RESTRICT_PARSING is off)
+        backend: Override the configured backend
+    """
+    from bs4 import BeautifulSoup
+    if not RESTRICT_PARSING:
+        parse_only = None
+    elif isinstance(parse_only, Strainer):
+        parse_only = parse_only.get()
+    return BeautifulSoup(content, backend or get_backend(), parse_only=parse_only)
+
+
+def has_class(attrs: dict, class_name: str) -> bool:
+    """Check a raw start-tag attribute dict for a CSS class (for strainer functions)."""
+    classes = attrs.get('class') or ''
+    if isinstance(classes, str):
+        classes = classes.split()
+    return class_name in classes
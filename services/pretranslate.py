@@ -0,0 +1,127 @@
+"""
+Eager pre-translation of refreshed menus.
+Whenever the menu store replaces a restaurant's menu, every language in
+SUPPORTED_LANGUAGES is translated in the background, so each language variant
+is ready before the first visitor asks for it.
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Dict, Optional
+from services.translator import (
+    translate_menus,
+    get_client,
+    SUPPORTED_LANGUAGES,
+    DEFAULT_LANGUAGE
+)
+
+# Languages translated at the same time
+CONCURRENCY = int(os.getenv('PRETRANSLATE_CONCURRENCY', '2'))
+
+# Attempts per language before giving up (the request path then translates lazily)
+MAX_ATTEMPTS = int(os.getenv('PRETRANSLATE_ATTEMPTS', '4'))
+
+# First retry delay in seconds, doubled on every further attempt
+BACKOFF_SECONDS = float(os.getenv('PRETRANSLATE_BACKOFF_SECONDS', '2'))
+
+_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+# (restaurant_id, lang) -> {'version': entry_version, 'days': {date: menu}}
+_variants: Dict[tuple, dict] = {}
+
+# Bumped whenever a variant is stored, so caches of translated output can be keyed on it
+_generation = 0
+
+_stats = {'translated': 0, 'retries': 0, 'failed': 0}
+
+
+def _translate_with_retry(restaurant_id: str, lang: str, days: Dict[date, list], version: int):
+    dates = list(days)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        # A newer menu was scheduled meanwhile; its own job takes over
+        current = _variants.get((restaurant_id, lang))
+        if current and current['version'] > version:
+            return
+        try:
+            menus = translate_menus([days[day] for day in dates], lang, raise_errors=True)
+        except Exception as e:
+            if attempt == MAX_ATTEMPTS:
+                print(f"Pre-translation of {restaurant_id} to {lang} failed: {e}")
+                _stats['failed'] += 1
+                return
+            _stats['retries'] += 1
+            delay = BACKOFF_SECONDS * 2 ** (attempt - 1)
+            time.sleep(delay + random.uniform(0, delay / 2))
+            continue
+
+        global _generation
+        with _lock:
+            current = _variants.get((restaurant_id, lang))
+            if current is None or current['version'] <= version:
+                _variants[(restaurant_id, lang)] = {'version': version, 'days': dict(zip(dates, menus))}
+                _generation += 1
+        _stats['translated'] += 1
+        return
+
+
+def schedule(restaurant_id: str, days: Dict[date, list], version: int):
+    """
+    Queue translation of a restaurant's menu into every supported language.
+    Meant as a menu_store listener; returns immediately.
+    """
+    global _executor
+    if get_client() is None:
+        return
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=CONCURRENCY, thread_name_prefix='pretranslate')
+    for lang in SUPPORTED_LANGUAGES:
+        if lang != DEFAULT_LANGUAGE:
+            _executor.submit(_translate_with_retry, restaurant_id, lang, days, version)
+
+
+def redate(restaurant_id: str, days: Dict[date, list], version: int):
+    """
+    Move the variants of an unchanged menu to its new dates, in date order.
+    Meant as a menu_store redate listener.
+    """
+    dates = sorted(days)
+    with _lock:
+        for (variant_id, _), variant in _variants.items():
+            if variant_id == restaurant_id and variant['version'] == version and len(variant['days']) == len(dates):
+                menus = [variant['days'][day] for day in sorted(variant['days'])]
+                variant['days'] = dict(zip(dates, menus))
+
+
+def get_menu(restaurant_id: str, lang: str, day: date, version: Optional[int]) -> Optional[list]:
+    """
+    Get a pre-translated menu.
+
+    Args:
+        restaurant_id: The restaurant identifier
+        lang: Target language code
+        day: Menu date
+        version: Entry version of the menu currently in the store
+
+    Returns:
+        The translated menu, or None if this version hasn't been translated
+        for that day (the caller then translates it itself)
+    """
+    variant = _variants.get((restaurant_id, lang))
+    if variant is None or variant['version'] != version:
+        return None
+    return variant['days'].get(day)
+
+
+def generation() -> int:
+    """Counter bumped every time a pre-translated variant becomes available."""
+    return _generation
+
+
+def stats() -> dict:
+    """Counters of completed, retried and failed pre-translations."""
+    return dict(_stats, variants=len(_variants))
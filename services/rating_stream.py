@@ -0,0 +1,186 @@
+"""
+Live rating updates over Server-Sent Events.
+Vote count changes are collected as they happen and broadcast at most every
+COALESCE_SECONDS as one event holding the latest counts of every changed meal
+(plus the top pick when it changed). All subscribers wait on a single
+condition and read from one shared ring of recent events, so an idle client
+costs a parked greenlet/thread and no per-client queue or query.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import date
+from typing import Dict, Iterator, Optional
+from services import top_pick
+
+# Minimum interval between broadcast events (bursts of votes are merged)
+COALESCE_SECONDS = float(os.getenv('SSE_COALESCE_SECONDS', '0.5'))
+
+# Comment line sent to idle clients so proxies don't drop the connection
+KEEPALIVE_SECONDS = float(os.getenv('SSE_KEEPALIVE_SECONDS', '15'))
+
+# Connections held per process; more are turned away with 503
+MAX_CLIENTS = int(os.getenv('SSE_MAX_CLIENTS', '500'))
+
+# Recent events kept for clients reconnecting with Last-Event-ID
+HISTORY_SIZE = 100
+
+_lock = threading.Lock()
+_changed = threading.Condition(_lock)
+
+# (restaurant_id, meal_name) -> counts not yet broadcast
+_dirty: Dict[tuple, dict] = {}
+_events: deque = deque(maxlen=HISTORY_SIZE)
+_last_id = 0
+_top_pick_sent: Optional[dict] = None
+_clients = 0
+
+_wakeup = threading.Event()
+_broadcaster: Optional[threading.Thread] = None
+
+_stats = {'events': 0, 'connections': 0, 'rejected': 0}
+
+
+def publish(changes: Dict[tuple, dict]):
+    """
+    Queue new vote counts for the next broadcast.
+    Meant as a top_pick listener; returns immediately.
+
+    Args:
+        changes: {(restaurant_id, meal_name): {'up', 'down', 'score'}}
+    """
+    if not _clients:
+        return
+    with _lock:
+        _dirty.update(changes)
+    _wakeup.set()
+
+
+def _format(event_id: int, event: str, data: dict) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _ratings_payload(counts: Dict[tuple, dict]) -> list:
+    return [
+        dict(restaurant_id=restaurant_id, meal_name=meal_name, **meal_counts)
+        for (restaurant_id, meal_name), meal_counts in counts.items()
+    ]
+
+
+def _broadcast():
+    """Turn the collected changes into one event and wake every subscriber."""
+    global _last_id, _top_pick_sent
+    pick = top_pick.get()
+    with _lock:
+        changes = dict(_dirty)
+        _dirty.clear()
+        data = {'date': date.today().isoformat()}
+        if changes:
+            data['ratings'] = _ratings_payload(changes)
+        if pick != _top_pick_sent:
+            data['top_pick'] = pick
+            _top_pick_sent = pick
+        if len(data) == 1:
+            return
+        _last_id += 1
+        _events.append((_last_id, _format(_last_id, 'ratings', data)))
+        _stats['events'] += 1
+        _changed.notify_all()
+
+
+def _run():
+    while True:
+        _wakeup.wait()
+        _wakeup.clear()
+        try:
+            _broadcast()
+        except Exception as e:
+            print(f"Rating stream broadcast failed: {e}")
+        # Votes arriving meanwhile wait for the next event
+        time.sleep(COALESCE_SECONDS)
+
+
+def _start():
+    global _broadcaster
+    with _lock:
+        if _broadcaster is not None and _broadcaster.is_alive():
+            return
+        _broadcaster = threading.Thread(target=_run, name='rating-stream', daemon=True)
+        _broadcaster.start()
+
+
+def _snapshot_event() -> str:
+    """Every count of the day, for new clients and ones that missed events."""
+    data = {
+        'date': date.today().isoformat(),
+        'ratings': _ratings_payload(top_pick.snapshot()),
+        'top_pick': top_pick.get(),
+    }
+    return _format(_last_id, 'ratings', data)
+
+
+def open_stream(last_event_id: Optional[str] = None) -> Optional[Iterator[str]]:
+    """
+    Register a subscriber and get its event stream.
+
+    Args:
+        last_event_id: Last-Event-ID sent by a reconnecting EventSource
+
+    Returns:
+        Generator of SSE-formatted chunks, or None if MAX_CLIENTS are connected
+    """
+    with _lock:
+        if _clients >= MAX_CLIENTS:
+            _stats['rejected'] += 1
+            return None
+    _start()
+
+    try:
+        seen = int(last_event_id) if last_event_id else None
+    except ValueError:
+        seen = None
+    return _stream(seen)
+
+
+def _stream(seen: Optional[int]) -> Iterator[str]:
+    global _clients
+    # Counted once the response is actually being sent, so the finally below always runs
+    with _lock:
+        _clients += 1
+        _stats['connections'] += 1
+    try:
+        yield f"retry: {int(KEEPALIVE_SECONDS * 1000)}\n\n"
+        with _lock:
+            oldest = _events[0][0] if _events else _last_id + 1
+            replayable = seen is not None and seen <= _last_id and seen + 1 >= oldest
+        if replayable:
+            backlog_from = seen
+        else:
+            # First connection or too far behind: send the full state instead
+            yield _snapshot_event()
+            backlog_from = _last_id
+
+        while True:
+            with _lock:
+                if _last_id == backlog_from:
+                    _changed.wait(KEEPALIVE_SECONDS)
+                pending = [chunk for event_id, chunk in _events if event_id > backlog_from]
+                missed = bool(_events) and _events[0][0] > backlog_from + 1
+                backlog_from = _last_id
+            if missed:
+                yield _snapshot_event()
+            elif pending:
+                yield ''.join(pending)
+            else:
+                yield ": keepalive\n\n"
+    finally:
+        with _lock:
+            _clients -= 1
+
+
+def stats() -> dict:
+    """Connected clients and broadcast counters."""
+    with _lock:
+        return dict(_stats, clients=_clients, last_event_id=_last_id)
@@ -0,0 +1,79 @@
+"""
+Streaming encoders for the ratings history and export endpoints.
+Turn the row iterators of services/database.py into response chunks (CSV,
+NDJSON or a JSON array), a batch of rows per chunk, without ever holding
+more than one batch in memory.
+"""
+import csv
+import io
+import json
+import os
+from datetime import date, datetime
+from typing import Iterable, Iterator, Sequence
+
+# Rows encoded into one response chunk
+CHUNK_ROWS = int(os.getenv('RATINGS_EXPORT_CHUNK_ROWS', '500'))
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _batches(rows: Iterable[tuple]) -> Iterator[list]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def csv_chunks(rows: Iterable[tuple], columns: Sequence[str]) -> Iterator[str]:
+    """CSV with a header line."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for batch in _batches(rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([[_value(value) for value in row] for row in batch])
+        yield buffer.getvalue()
+
+
+def ndjson_chunks(rows: Iterable[tuple], columns: Sequence[str]) -> Iterator[str]:
+    """One JSON object per line."""
+    for batch in _batches(rows):
+        yield ''.join(
+            json.dumps({column: _value(value) for column, value in zip(columns, row)}, ensure_ascii=False) + '\n'
+            for row in batch
+        )
+
+
+def json_array_chunks(rows: Iterable[tuple], columns: Sequence[str]) -> Iterator[str]:
+    """A single JSON array of objects, streamed."""
+    yield '['
+    separator = ''
+    for batch in _batches(rows):
+        yield separator + ','.join(
+            json.dumps({column: _value(value) for column, value in zip(columns, row)}, ensure_ascii=False)
+            for row in batch
+        )
+        separator = ','
+    yield ']'
+
+
+def encode(rows: Iterable[tuple], columns: Sequence[str], export_format: str) -> Iterator[str]:
+    """Encode rows in one of FORMATS."""
+    if export_format == 'csv':
+        return csv_chunks(rows, columns)
+    return ndjson_chunks(rows, columns)
@@ -0,0 +1,310 @@
+"""
+Menu scrapers for the three Keilaniemi restaurants.
+Each source is split into a fetch step (network) and a parse step (HTML/RSS),
+so the two can be timed and scheduled independently.
+"""
+import hashlib
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+from services.http_client import NotModified, conditional_get
+from services.parsing import Strainer, has_class, make_soup
+
+# Source URLs (overridable, e.g. to point at the offline stub in benchmarks/load_test.py)
+ISS_URL = os.getenv('ISS_MENU_URL', 'https://fg.ravintolapalvelut.iss.fi/')
+NEST_URL = os.getenv('NEST_MENU_URL', 'https://www.nest-restaurant.fi/en')
+COMPASS_URL = os.getenv(
+    'COMPASS_MENU_URL',
+    'https://www.compass-group.fi/menuapi/feed/rss/current-day?costNumber=3283&language=en'
+)
+
+# Subtrees each scraper reads; everything else on the page is skipped while parsing
+ISS_PARSE_ONLY = Strainer(lambda name, attrs: (
+    (name == 'h2' and has_class(attrs, 'lunch-menu__title'))
+    or (name == 'article' and has_class(attrs, 'lunch-menu'))
+))
+NEST_PARSE_ONLY = Strainer(attrs={'data-hook': 'menu.container'})
+COMPASS_PARSE_ONLY = Strainer('item')
+
+# Control characters (other than tab and newlines) occasionally pasted into menus upstream
+_CONTROL_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+
+ENGLISH_WEEKDAYS = [
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+]
+
+
+def fetch_iss(url: str = ISS_URL):
+    """Download the ISS weekly menu page (NotModified if unchanged)."""
+    return conditional_get(url, timeout=10)
+
+
+def _iss_week_start(title: str) -> date:
+    """
+    Monday of the week named in an ISS menu title such as 'Week 42'.
+    Falls back to the current week when the title carries no usable week number.
+    """
+    today = date.today()
+    match = re.search(r'Week\s*(\d{1,2})', title)
+    if match:
+        week = int(match.group(1))
+        year, current_week, _ = today.isocalendar()
+        # Around New Year the page can name a week of the neighbouring year
+        if week - current_week > 26:
+            year -= 1
+        elif current_week - week > 26:
+            year += 1
+        try:
+            return date.fromisocalendar(year, week, 1)
+        except ValueError:
+            pass
+    return today - timedelta(days=today.weekday())
+
+
+def _iss_day_meals(meal_days: list, headers: list, paragraphs: list, day_index: int) -> list:
+    """
+    Extract one weekday's meals from the pre-split ISS day sections.
+
+    Args:
+        meal_days: The lunch-menu__day divs of the English menu
+        headers: Lowercased header text per day div (None if it has no header)
+        paragraphs: Stripped paragraph texts per day div
+        day_index: Weekday to extract (0 = Monday)
+    """
+    meals = []
+    current_day_name = ENGLISH_WEEKDAYS[day_index].lower()
+
+    # Find the correct day section by matching day name in header
+    target = None
+    for index, header_text in enumerate(headers):
+        if header_text is not None and current_day_name in header_text:
+            target = index
+            break
+
+    # Fallback to index-based if name matching fails
+    if target is None and day_index < len(meal_days):
+        target = day_index
+
+    # SPECIAL CASE: If it's Friday and we couldn't find Friday section,
+    # look for Friday data embedded in Thursday's section (data corruption recovery)
+    search_within_previous_day = False
+    if target is None and day_index == 4:  # Friday
+        # Try to find Thursday's section and extract Friday from it
+        for index, header_text in enumerate(headers):
+            if header_text is not None and 'thursday' in header_text:
+                target = index
+                search_within_previous_day = True
+                break
+        # Or use index 3 (Thursday) as fallback
+        if target is None and len(meal_days) > 3:
+            target = 3
+            search_within_previous_day = True
+
+    if target is None:
+        return meals
+
+    collecting = not search_within_previous_day  # Start collecting immediately unless searching for embedded day
+
+    for meal_text in paragraphs[target]:
+        if not meal_text:
+            continue
+
+        # If searching within previous day's section for current day's data
+        if search_within_previous_day:
+            # Start collecting when we see current day's name
+            if current_day_name in meal_text.lower():
+                collecting = True
+                continue  # Skip the day header line itself
+            if not collecting:
+                continue
+
+        # Stop if we hit the next day's header
+        next_day_index = day_index + 1
+        if next_day_index < 5:  # There's a next weekday
+            next_day_name = ENGLISH_WEEKDAYS[next_day_index].lower()
+            if next_day_name in meal_text.lower():
+                break
+
+        # Also stop if we hit a different day header (general case)
+        text_lower = meal_text.lower()
+        is_day_header = any(day.lower() in text_lower and len(meal_text) < 20
+                           for day in ENGLISH_WEEKDAYS[:5])
+        if is_day_header and current_day_name not in text_lower:
+            if not search_within_previous_day:
+                break
+            continue
+
+        if ':' in meal_text:
+            label_raw, description_raw = meal_text.split(':', 1)
+            label = label_raw.strip() or 'Main'
+            description = description_raw.strip()
+        else:
+            label = 'Main'
+            description = meal_text.strip()
+
+        if not description:
+            description = label
+
+        meals.append({
+            'label': label,
+            'description': description,
+        })
+    return meals
+
+
+# Last parsed ISS page, so an unchanged page is only parsed once per week
+_iss_week_cache: dict = {}
+
+
+def _clean_meals(meals: list) -> list:
+    """Drop control characters from every text field of parsed meals."""
+    return [
+        {key: _CONTROL_CHARS.sub('', value) if isinstance(value, str) else value for key, value in meal.items()}
+        for meal in meals
+    ]
+
+
+def parse_iss_week(content) -> Dict[date, list]:
+    """
+    Index the whole ISS weekly menu page by date in a single pass.
+
+    Returns:
+        Dict mapping each weekday's date (Monday to Friday) to its meals;
+        empty if the English menu section is missing
+    """
+    raw = content.encode('utf-8') if isinstance(content, str) else content
+    today = date.today()
+    cache_key = (hashlib.sha1(raw).hexdigest(), today - timedelta(days=today.weekday()))
+    if _iss_week_cache.get('key') == cache_key:
+        return _iss_week_cache['week']
+
+    soup = make_soup(content, ISS_PARSE_ONLY)
+    week = {}
+
+    # Find the English section by looking for the h2 element with text starting with "Week"
+    english_section = soup.find('h2', class_='lunch-menu__title multiple js-lunch-menu-toggle', string=lambda t: t and t.startswith('Week'))
+    if english_section:
+        # Get the parent article of the English section
+        english_menu = english_section.find_next('article', class_='lunch-menu')
+        if english_menu:
+            week_start = _iss_week_start(english_section.get_text(strip=True))
+            meal_days = english_menu.find_all('div', class_='lunch-menu__day')
+
+            # Read every day's header (h3 or strong element containing day name) and paragraphs once
+            headers = []
+            paragraphs = []
+            for day_div in meal_days:
+                day_header = day_div.find(['h3', 'strong', 'b'])
+                headers.append(day_header.get_text(strip=True).lower() if day_header else None)
+                paragraphs.append([item.get_text(strip=True) for item in day_div.find_all('p')])
+
+            for day_index in range(5):
+                week[week_start + timedelta(days=day_index)] = _clean_meals(
+                    _iss_day_meals(meal_days, headers, paragraphs, day_index)
+                )
+
+    _iss_week_cache['key'] = cache_key
+    _iss_week_cache['week'] = week
+    return week
+
+
+def parse_iss(content) -> list:
+    """Extract today's meals from the ISS weekly menu page."""
+    return parse_iss_week(content).get(date.today(), [])
+
+
+def fetch_nest(url: str = NEST_URL):
+    """Download the Nest menu page (NotModified if unchanged)."""
+    return conditional_get(url, timeout=12, as_text=True)
+
+
+def parse_nest(content, day: Optional[date] = None) -> list:
+    """Extract a day's meals (defaults to today) from the Nest menu page."""
+    current_weekday_index = (day or datetime.today()).weekday()
+    english_weekday = ENGLISH_WEEKDAYS[current_weekday_index]
+
+    soup = make_soup(content, NEST_PARSE_ONLY)
+    menu_container = soup.select_one('[data-hook="menu.container"]')
+    if not menu_container:
+        return []
+
+    sections = menu_container.select('[data-hook="section.container"]')
+    meals = []
+    for section in sections:
+        name_el = section.select_one('[data-hook="section.name"]')
+        if not name_el:
+            continue
+        section_name = name_el.get_text(strip=True)
+        if not section_name.startswith(english_weekday):
+            continue
+
+        for item in section.select('[data-hook="item.container"]'):
+            title_el = item.select_one('[data-hook="item.name"]')
+            if not title_el:
+                continue
+            title = title_el.get_text(strip=True)
+            description_el = item.select_one('[data-hook="item.description"]')
+            description = description_el.get_text(" ", strip=True) if description_el else ''
+            description = re.sub(r"\s+", " ", description).strip()
+
+            combined = f"{title}: {description}" if description else title
+            label, desc = (part.strip() for part in combined.split(':', 1)) if ':' in combined else (combined.strip(), '')
+            meals.append({'label': label, 'description': desc})
+        break
+
+    return _clean_meals(meals)
+
+
+def fetch_compass(url: str = COMPASS_URL):
+    """Download the Compass Group current-day RSS feed (NotModified if unchanged)."""
+    return conditional_get(url, timeout=10)
+
+
+def parse_compass(content) -> list:
+    """Extract today's meals from the Compass Group RSS feed."""
+    soup = make_soup(content, COMPASS_PARSE_ONLY)
+    meals = []
+    # Find the item tag in the RSS feed
+    item = soup.find('item')
+    if item:
+        # Find the description tag within the item
+        description = item.find('description')
+        if description:
+            # Get the description content as is
+            description_content = description.get_text().strip()
+            # Remove text before "€:" using regex
+            description_content = re.sub(r'^.*?€:', '', description_content, flags=re.DOTALL).strip()
+            # Replace multiple <br> tags with a single newline
+            description_content = re.sub(r'(<br\s*/?>\s*)+', '\n', description_content)
+            # Split the description content by newlines and append each line as a separate meal entry
+            for line in description_content.split('\n'):
+                line = line.strip()
+                if line:
+                    meals.append({'name': line})
+    return _clean_meals(meals)
+
+
+def _body(fetched):
+    return fetched.content if isinstance(fetched, NotModified) else fetched
+
+
+def scrape_iss(url: str = ISS_URL) -> list:
+    """Fetch and parse the ISS menu in one call."""
+    return parse_iss(_body(fetch_iss(url)))
+
+
+def scrape_nest(url: str = NEST_URL) -> list:
+    """Fetch and parse the Nest menu in one call."""
+    return parse_nest(_body(fetch_nest(url)))
+
+
+def scrape_compass(url: str = COMPASS_URL) -> list:
+    """Fetch and parse the Compass Group menu in one call."""
+    return parse_compass(_body(fetch_compass(url)))
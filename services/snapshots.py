@@ -0,0 +1,106 @@
+"""
+Last-known-good menu snapshots on disk.
+Every successfully scraped menu is written to
+<SNAPSHOT_DIR>/<restaurant_id>-<YYYY-MM-DD>.json (atomically, via a temporary
+file and os.replace) and the newest snapshot per restaurant is loaded at
+startup, so a restarted app serves menus before its first scrape and keeps
+serving them while an upstream is down.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import date
+from typing import Dict, Optional
+
+SNAPSHOT_DIR = os.getenv(
+    'MENU_SNAPSHOT_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'menu_snapshots')
+)
+
+# Dated snapshots kept per restaurant (older ones are deleted)
+KEEP = int(os.getenv('MENU_SNAPSHOT_KEEP', '7'))
+
+# Bumped when the file layout changes; snapshots of other versions are ignored
+FORMAT_VERSION = 1
+
+_lock = threading.Lock()
+
+# restaurant_id -> hash of the last menu written or loaded, to skip rewriting unchanged menus
+_saved: Dict[str, str] = {}
+
+
+def _content_hash(days: Dict[str, list]) -> str:
+    return hashlib.sha1(json.dumps(days, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _snapshot_files(restaurant_id: str) -> list:
+    """Snapshot file names of a restaurant, newest first."""
+    prefix = f"{restaurant_id}-"
+    try:
+        names = os.listdir(SNAPSHOT_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted((name for name in names if name.startswith(prefix) and name.endswith('.json')), reverse=True)
+
+
+def save(restaurant_id: str, days: Dict[date, list], version: Optional[int] = None):
+    """
+    Write a restaurant's menu to today's snapshot file.
+    Meant as a menu_store listener; unchanged menus are not rewritten.
+    """
+    serialized = {day.isoformat(): meals for day, meals in days.items()}
+    digest = _content_hash(serialized)
+    if _saved.get(restaurant_id) == digest:
+        return
+
+    snapshot = {
+        'format': FORMAT_VERSION,
+        'restaurant_id': restaurant_id,
+        'fetched_at': time.time(),
+        'days': serialized,
+    }
+    path = os.path.join(SNAPSHOT_DIR, f"{restaurant_id}-{date.today().isoformat()}.json")
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with _lock:
+            os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            # Readers (and other workers) see the old file or the new one, never a partial write
+            os.replace(tmp_path, path)
+            _saved[restaurant_id] = digest
+            for old_name in _snapshot_files(restaurant_id)[KEEP:]:
+                os.remove(os.path.join(SNAPSHOT_DIR, old_name))
+    except OSError as e:
+        print(f"Menu snapshot write failed for {restaurant_id}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def load_latest(restaurant_id: str) -> Optional[dict]:
+    """
+    Read the newest readable snapshot of a restaurant.
+
+    Returns:
+        Dict with 'days' (date -> meal list) and 'fetched_at' (epoch seconds),
+        or None if there is no usable snapshot
+    """
+    for name in _snapshot_files(restaurant_id):
+        try:
+            with open(os.path.join(SNAPSHOT_DIR, name), encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if snapshot.get('format') != FORMAT_VERSION:
+                continue
+            days = {date.fromisoformat(day): meals for day, meals in snapshot['days'].items()}
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            print(f"Skipping unreadable menu snapshot {name}: {e}")
+            continue
+        _saved[restaurant_id] = _content_hash(snapshot['days'])
+        return {'days': days, 'fetched_at': snapshot['fetched_at']}
+    return None
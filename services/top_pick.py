@@ -0,0 +1,232 @@
+"""
+In-memory top pick of the day.
+Keeps the score and vote count of every meal rated today, updated as votes
+are accepted, so the top pick is answered without the cross-restaurant
+query. The counts are seeded from the database at startup and on a day
+rollover, and reconciled on a timer to pick up votes recorded by other
+workers and instances.
+"""
+import os
+import threading
+import time
+from datetime import date
+from typing import Callable, Dict, List, Optional
+from services.database import get_daily_scores
+from services import vote_buffer
+
+# How often the counts are re-read from the database
+RECONCILE_SECONDS = float(os.getenv('TOP_PICK_RECONCILE_SECONDS', '60'))
+
+# Wait before retrying a failed seed, so an unavailable database isn't queried per request
+RETRY_SECONDS = 10
+
+_lock = threading.Lock()
+_day: Optional[date] = None
+_seed_attempt_at = 0.0
+
+# (restaurant_id, meal_name) -> {'score': int, 'total_votes': int}
+_meals: Dict[tuple, dict] = {}
+_best: Optional[tuple] = None
+
+# Callbacks run with {(restaurant_id, meal_name): {'up', 'down', 'score'}} for changed meals
+_listeners: List[Callable[[Dict[tuple, dict]], None]] = []
+
+_stop = threading.Event()
+_reconciler: Optional[threading.Thread] = None
+
+_stats = {'seeds': 0, 'reconciles': 0, 'corrections': 0}
+
+
+def add_listener(callback: Callable[[Dict[tuple, dict]], None]):
+    """Register a callback run with the new counts of meals whose votes changed."""
+    _listeners.append(callback)
+
+
+def _vote_counts(counts: dict) -> dict:
+    # Every vote is +1 or -1, so up/down follow from the score and vote count
+    return {
+        'up': (counts['total_votes'] + counts['score']) // 2,
+        'down': (counts['total_votes'] - counts['score']) // 2,
+        'score': counts['score'],
+    }
+
+
+def _notify(changed: Dict[tuple, dict]):
+    if not changed:
+        return
+    for callback in _listeners:
+        try:
+            callback(changed)
+        except Exception as e:
+            print(f"Top pick listener failed: {e}")
+
+
+def _rank(key: tuple) -> tuple:
+    counts = _meals[key]
+    return counts['score'], counts['total_votes']
+
+
+def _find_best() -> Optional[tuple]:
+    # Same ordering as get_top_pick: positive score first, then most votes
+    candidates = [key for key, counts in _meals.items() if counts['score'] > 0]
+    return max(candidates, key=_rank) if candidates else None
+
+
+def _apply(meals: Dict[tuple, dict], restaurant_id: str, meal_name: str, rating: int):
+    counts = meals.setdefault((restaurant_id, meal_name), {'score': 0, 'total_votes': 0})
+    counts['score'] += rating
+    counts['total_votes'] += 1
+
+
+def _load(day: date) -> Optional[Dict[tuple, dict]]:
+    """Read a day's counts from the database plus the votes this process hasn't written yet."""
+    try:
+        rows = get_daily_scores(day)
+    except Exception as e:
+        print(f"Top pick seed error: {e}")
+        return None
+    if rows is None:
+        return None
+
+    meals = {
+        (row['restaurant_id'], row['meal_name']): {'score': row['score'], 'total_votes': row['total_votes']}
+        for row in rows
+    }
+    for restaurant_id, meal_name, rating, vote_date in vote_buffer.pending_votes():
+        if vote_date == day:
+            _apply(meals, restaurant_id, meal_name, rating)
+    return meals
+
+
+def reconcile(force: bool = False) -> bool:
+    """
+    Replace the counts with the database's (plus pending votes).
+    Also used for the initial seed and on a day rollover.
+
+    Args:
+        force: Query even if a failed attempt was made less than RETRY_SECONDS ago
+
+    Returns:
+        True if the counts were loaded
+    """
+    global _day, _meals, _best, _seed_attempt_at
+    today = date.today()
+    now = time.time()
+    if not force and _day != today and now - _seed_attempt_at < RETRY_SECONDS:
+        return False
+    _seed_attempt_at = now
+
+    meals = _load(today)
+    if meals is None:
+        return False
+
+    changed = {}
+    with _lock:
+        if _day == today:
+            _stats['reconciles'] += 1
+            # Votes recorded elsewhere (or lost here) since the last read
+            changed = {
+                key: _vote_counts(counts) for key, counts in meals.items()
+                if _meals.get(key) != counts
+            }
+            if changed:
+                _stats['corrections'] += 1
+        else:
+            _stats['seeds'] += 1
+        _day = today
+        _meals = meals
+        _best = _find_best()
+    _notify(changed)
+    return True
+
+
+def record_vote(restaurant_id: str, meal_name: str, rating: int, meal_date: Optional[date] = None):
+    """Count an accepted vote towards the top pick."""
+    if meal_date is None:
+        meal_date = date.today()
+    if _day != meal_date:
+        # Not seeded yet, or a new day: the seed will include this vote
+        # while it is still pending in the vote buffer
+        reconcile()
+        return
+
+    global _best
+    with _lock:
+        _apply(_meals, restaurant_id, meal_name, rating)
+        key = (restaurant_id, meal_name)
+        if key == _best and rating < 0:
+            # The leader lost a point, another meal may have overtaken it
+            _best = _find_best()
+        elif _meals[key]['score'] > 0 and (_best is None or _rank(key) > _rank(_best)):
+            _best = key
+        changed = {key: _vote_counts(_meals[key])}
+    _notify(changed)
+
+
+def get(meal_date: Optional[date] = None) -> Optional[dict]:
+    """
+    Get the top pick of today.
+
+    Returns:
+        Dict with restaurant_id, meal_name, score and total_votes (like
+        database.get_top_pick), or None if nothing has a positive score
+        or the database is unavailable
+    """
+    if meal_date is None:
+        meal_date = date.today()
+    if meal_date != date.today():
+        return None
+    if _day != meal_date:
+        reconcile()
+
+    with _lock:
+        if _day != meal_date or _best is None:
+            return None
+        restaurant_id, meal_name = _best
+        counts = _meals[_best]
+        return {
+            'restaurant_id': restaurant_id,
+            'meal_name': meal_name,
+            'score': counts['score'],
+            'total_votes': counts['total_votes']
+        }
+
+
+def snapshot() -> Dict[tuple, dict]:
+    """Current {'up', 'down', 'score'} counts of every meal rated today."""
+    with _lock:
+        return {key: _vote_counts(counts) for key, counts in _meals.items()}
+
+
+def _run():
+    while not _stop.wait(RECONCILE_SECONDS):
+        reconcile(force=True)
+
+
+def start():
+    """Seed the counts and start the reconcile thread (no-op if it is already running)."""
+    global _reconciler
+    if _reconciler is not None and _reconciler.is_alive():
+        return
+    with _lock:
+        if _reconciler is not None and _reconciler.is_alive():
+            return
+        _stop.clear()
+        _reconciler = threading.Thread(target=_run, name='top-pick-reconciler', daemon=True)
+        _reconciler.start()
+    reconcile(force=True)
+
+
+def stop():
+    """Stop the reconcile thread."""
+    global _reconciler
+    _stop.set()
+    if _reconciler is not None:
+        _reconciler.join(timeout=5)
+        _reconciler = None
+
+
+def stats() -> dict:
+    """Seed/reconcile counters and the number of meals tracked."""
+    with _lock:
+        return dict(_stats, day=_day.isoformat() if _day else None, meals=len(_meals))
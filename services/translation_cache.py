@@ -0,0 +1,174 @@
+"""
+Two-level translation cache shared across workers and restarts.
+An in-process LRU sits in front of a persistent store keyed by
+(source text hash, source lang, target lang): the Postgres pool from
+services.database when configured, otherwise a local SQLite file.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+from services.database import get_translations, save_translations
+
+# Entries kept in the in-process LRU
+LRU_SIZE = int(os.getenv('TRANSLATION_LRU_SIZE', '1000'))
+
+# Persistent store: 'postgres', 'sqlite' or 'none' (defaults to postgres when a DB is configured)
+BACKEND = os.getenv(
+    'TRANSLATION_CACHE_BACKEND',
+    'postgres' if os.getenv('POSTGRES_CONNECTION_STRING') else 'sqlite'
+)
+
+SQLITE_PATH = os.getenv(
+    'TRANSLATION_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance', 'translations.sqlite3')
+)
+
+_lru: OrderedDict = OrderedDict()
+_lock = threading.Lock()
+
+_stats = {'lru_hits': 0, 'store_hits': 0, 'misses': 0}
+
+# SQLite connection singleton (shared by threads, guarded by _sqlite_lock)
+_sqlite: Optional[sqlite3.Connection] = None
+_sqlite_lock = threading.Lock()
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 hex digest used as the persistent key of a source text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _get_sqlite() -> sqlite3.Connection:
+    global _sqlite
+    if _sqlite is None:
+        os.makedirs(os.path.dirname(SQLITE_PATH), exist_ok=True)
+        conn = sqlite3.connect(SQLITE_PATH, check_same_thread=False, timeout=5)
+        # WAL lets several gunicorn workers read while one writes
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                text_hash TEXT NOT NULL,
+                source_lang TEXT NOT NULL,
+                target_lang TEXT NOT NULL,
+                translated_text TEXT NOT NULL,
+                created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (text_hash, source_lang, target_lang)
+            )
+        """)
+        conn.commit()
+        _sqlite = conn
+    return _sqlite
+
+
+def _store_get(hashes: list, source_lang: str, target_lang: str) -> Dict[str, str]:
+    if BACKEND == 'postgres':
+        return get_translations(hashes, source_lang, target_lang)
+    if BACKEND == 'sqlite':
+        with _sqlite_lock:
+            conn = _get_sqlite()
+            found = {}
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(
+                    f"SELECT text_hash, translated_text FROM translations "
+                    f"WHERE source_lang = ? AND target_lang = ? AND text_hash IN ({placeholders})",
+                    [source_lang, target_lang, *chunk],
+                )
+                found.update(rows.fetchall())
+            return found
+    return {}
+
+
+def _store_put(translations: Dict[str, str], source_lang: str, target_lang: str):
+    if BACKEND == 'postgres':
+        save_translations(translations, source_lang, target_lang)
+    elif BACKEND == 'sqlite':
+        with _sqlite_lock:
+            conn = _get_sqlite()
+            conn.executemany(
+                "INSERT OR IGNORE INTO translations (text_hash, source_lang, target_lang, translated_text) "
+                "VALUES (?, ?, ?, ?)",
+                [(key, source_lang, target_lang, text) for key, text in translations.items()],
+            )
+            conn.commit()
+
+
+def _lru_put(key: tuple, value: str):
+    with _lock:
+        _lru[key] = value
+        _lru.move_to_end(key)
+        while len(_lru) > LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def lookup(texts: Iterable[str], target_lang: str, source_lang: str = 'en') -> Dict[str, str]:
+    """
+    Find cached translations, checking the LRU first and the persistent store
+    for the rest in a single query.
+
+    Returns:
+        Dict mapping source text to translation for every text found
+    """
+    found: Dict[str, str] = {}
+    pending: Dict[str, str] = {}
+    with _lock:
+        for text in texts:
+            if text in found:
+                continue
+            value = _lru.get((text, target_lang, source_lang))
+            if value is not None:
+                _lru.move_to_end((text, target_lang, source_lang))
+                found[text] = value
+                _stats['lru_hits'] += 1
+            else:
+                pending[text_hash(text)] = text
+
+    if pending:
+        try:
+            stored = _store_get(list(pending), source_lang, target_lang)
+        except Exception as e:
+            print(f"Translation cache read error: {e}")
+            stored = {}
+        for key, value in stored.items():
+            text = pending[key]
+            found[text] = value
+            _lru_put((text, target_lang, source_lang), value)
+        with _lock:
+            _stats['store_hits'] += len(stored)
+            _stats['misses'] += len(pending) - len(stored)
+
+    return found
+
+
+def store(translations: Dict[str, str], target_lang: str, source_lang: str = 'en'):
+    """Cache new translations (source text -> translation) in the LRU and persistent store."""
+    if not translations:
+        return
+    for text, value in translations.items():
+        _lru_put((text, target_lang, source_lang), value)
+    try:
+        _store_put({text_hash(text): value for text, value in translations.items()}, source_lang, target_lang)
+    except Exception as e:
+        print(f"Translation cache write error: {e}")
+
+
+def stats() -> dict:
+    """Hit/miss counters of both cache levels."""
+    with _lock:
+        counts = dict(_stats)
+        counts['lru_size'] = len(_lru)
+    total = counts['lru_hits'] + counts['store_hits'] + counts['misses']
+    counts['hit_rate'] = round((counts['lru_hits'] + counts['store_hits']) / total, 3) if total else None
+    counts['backend'] = BACKEND
+    return counts
+
+
+def clear():
+    """Clear the in-process LRU (the persistent store is kept)."""
+    with _lock:
+        _lru.clear()
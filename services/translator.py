@@ -1,12 +1,14 @@
 """
 Azure AI Translator service for multilingual menu support.
-Detects browser language and translates menu items with in-memory caching.
+Detects browser language and translates menu items, caching results in
+services.translation_cache so they survive restarts and are shared by workers.
 """
 import os
-from functools import lru_cache
-from typing import Optional
-from azure.ai.translation.text import TextTranslationClient
-from azure.core.credentials import AzureKeyCredential
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Set
+from services import translation_cache
+
+if TYPE_CHECKING:
+    from azure.ai.translation.text import TextTranslationClient
 
 # Supported languages (ISO 639-1 codes)
 SUPPORTED_LANGUAGES = {
@@ -19,11 +21,18 @@ SUPPORTED_LANGUAGES = {
 
 DEFAULT_LANGUAGE = 'en'
 
-# Global client instance
-_client: Optional[TextTranslationClient] = None
+# Menu item fields that carry translatable text
+TRANSLATED_FIELDS = ('label', 'description', 'name')
+
+# Azure Translator limits per request: 1000 array elements and 50,000 characters in total
+MAX_BATCH_ITEMS = 1000
+MAX_BATCH_CHARS = 50000
+
+# Global client instance (the Azure SDK is only imported once a key is configured)
+_client: Optional['TextTranslationClient'] = None
 
 
-def get_client() -> Optional[TextTranslationClient]:
+def get_client() -> Optional['TextTranslationClient']:
     """Get or create the translation client singleton."""
     global _client
     if _client is None:
@@ -32,6 +41,8 @@ def get_client() -> Optional[TextTranslationClient]:
         region = os.getenv('TRANSLATOR_REGION', 'swedencentral')
         
         if key and endpoint:
+            from azure.ai.translation.text import TextTranslationClient
+            from azure.core.credentials import AzureKeyCredential
             _client = TextTranslationClient(
                 credential=AzureKeyCredential(key),
                 endpoint=endpoint,
@@ -77,61 +88,116 @@ def parse_accept_language(header: str) -> str:
     return DEFAULT_LANGUAGE
 
 
-@lru_cache(maxsize=1000)
+def _batches(texts: List[str]) -> Iterator[List[str]]:
+    """Split texts into chunks that respect the Translator request limits."""
+    batch: List[str] = []
+    chars = 0
+    for text in texts:
+        if batch and (len(batch) >= MAX_BATCH_ITEMS or chars + len(text) > MAX_BATCH_CHARS):
+            yield batch
+            batch = []
+            chars = 0
+        batch.append(text)
+        chars += len(text)
+    if batch:
+        yield batch
+
+
+def translate_batch(texts: List[str], target_lang: str, source_lang: str = 'en',
+                    raise_errors: bool = False, missed: Optional[Set[str]] = None) -> List[str]:
+    """
+    Translate a list of texts with caching, sending only uncached strings.
+    Duplicates are translated once and uncached strings go out in as few
+    requests as the Translator size limits allow.
+    Returns the translations in input order; any text that can't be translated
+    is returned unchanged (and not cached, so it is retried later) and added
+    to `missed` if given, so callers know not to keep the result for long.
+    With raise_errors, Translator errors are raised instead, after caching
+    the batches that did succeed.
+    """
+    if target_lang == source_lang or target_lang not in SUPPORTED_LANGUAGES:
+        return list(texts)
+
+    unique = list(dict.fromkeys(text for text in texts if text))
+    translations: Dict[str, str] = translation_cache.lookup(unique, target_lang, source_lang)
+    missing = [text for text in unique if text not in translations]
+
+    fresh: Dict[str, str] = {}
+    client = get_client() if missing else None
+    if client is not None:
+        for batch in _batches(missing):
+            try:
+                response = client.translate(
+                    body=batch,
+                    to_language=[target_lang],
+                    from_language=source_lang
+                )
+            except Exception as e:
+                if raise_errors:
+                    translation_cache.store(fresh, target_lang, source_lang)
+                    raise
+                print(f"Translation error: {e}")
+                continue
+            for text, item in zip(batch, response or []):
+                if item.translations:
+                    fresh[text] = item.translations[0].text
+        translation_cache.store(fresh, target_lang, source_lang)
+        translations.update(fresh)
+
+    if missed is not None:
+        missed.update(text for text in unique if text not in translations)
+    return [translations.get(text, text) if text else text for text in texts]
+
+
 def translate_text(text: str, target_lang: str, source_lang: str = 'en') -> str:
     """
     Translate text to target language with caching.
     Returns original text if translation fails or is unavailable.
     """
-    if not text or target_lang == source_lang:
-        return text
-    
-    if target_lang not in SUPPORTED_LANGUAGES:
-        return text
-    
-    client = get_client()
-    if client is None:
-        # No translator configured, return original
+    if not text:
         return text
-    
-    try:
-        response = client.translate(
-            body=[text],
-            to_language=[target_lang],
-            from_language=source_lang
-        )
-        if response and response[0].translations:
-            return response[0].translations[0].text
-    except Exception as e:
-        print(f"Translation error: {e}")
-    
-    return text
+    return translate_batch([text], target_lang, source_lang)[0]
 
 
-def translate_menu(menu: list, target_lang: str) -> list:
+def translate_menus(menus: List[list], target_lang: str, raise_errors: bool = False,
+                    missed: Optional[Set[str]] = None) -> List[list]:
     """
-    Translate all items in a menu list.
+    Translate several menus (e.g. all restaurants on a page) in one batch.
     Handles both {'label': ..., 'description': ...} and {'name': ...} formats.
+    Texts left untranslated are added to `missed` (see translate_batch).
     """
     if target_lang == DEFAULT_LANGUAGE:
-        return menu
-    
+        return menus
+
+    texts = []
+    for menu in menus:
+        for item in menu:
+            for field in TRANSLATED_FIELDS:
+                if field in item:
+                    texts.append(item[field])
+    translated_texts = iter(translate_batch(texts, target_lang, raise_errors=raise_errors, missed=missed))
+
     translated = []
-    for item in menu:
-        new_item = dict(item)
-        
-        if 'label' in new_item:
-            new_item['label'] = translate_text(new_item['label'], target_lang)
-        if 'description' in new_item:
-            new_item['description'] = translate_text(new_item['description'], target_lang)
-        if 'name' in new_item:
-            new_item['name'] = translate_text(new_item['name'], target_lang)
-        
-        translated.append(new_item)
-    
+    for menu in menus:
+        new_menu = []
+        for item in menu:
+            new_item = dict(item)
+            for field in TRANSLATED_FIELDS:
+                if field in new_item:
+                    new_item[field] = next(translated_texts)
+            new_menu.append(new_item)
+        translated.append(new_menu)
     return translated
 
 
+def translate_menu(menu: list, target_lang: str) -> list:
+    """
+    Translate all items in a menu list.
+    Handles both {'label': ..., 'description': ...} and {'name': ...} formats.
+    """
+    return translate_menus([menu], target_lang)[0]
+
+
 def clear_cache():
-    """Clear the translation cache."""
-    translate_text.cache_clear()
+    """Clear the in-process translation cache."""
+    translation_cache.clear()
@@ -0,0 +1,214 @@
+"""
+Write-behind buffer for meal ratings.
+Votes are acknowledged immediately with an optimistic in-memory count and
+written to the database in batches once enough have queued up or the flush
+interval has passed. Pending votes are flushed on graceful shutdown.
+"""
+import atexit
+import os
+import threading
+import time
+from datetime import date
+from typing import Callable, Dict, List, Optional
+from services.database import add_rating, add_ratings_batch, get_ratings_summary
+
+# Flush as soon as this many votes are pending...
+BATCH_SIZE = int(os.getenv('VOTE_BATCH_SIZE', '50'))
+
+# ...or when the oldest pending vote is this many seconds old
+FLUSH_INTERVAL_SECONDS = float(os.getenv('VOTE_FLUSH_INTERVAL_SECONDS', '1'))
+
+# Optimistic counts are re-read from the database after this long, so votes
+# recorded by other workers are picked up
+TALLY_TTL_SECONDS = float(os.getenv('VOTE_TALLY_TTL_SECONDS', '60'))
+
+_lock = threading.Lock()
+_pending: List[tuple] = []
+_wakeup = threading.Event()
+_stop = threading.Event()
+_flusher: Optional[threading.Thread] = None
+
+# (restaurant_id, meal_date) -> {'seeded_at': float, 'meals': {meal_name: counts}}
+_tallies: Dict[tuple, dict] = {}
+
+# Callbacks run after a batch has been written
+_flush_listeners: List[Callable[[set], None]] = []
+
+_stats = {'accepted': 0, 'flushed': 0, 'batches': 0, 'flush_errors': 0}
+
+
+def add_flush_listener(callback: Callable[[set], None]):
+    """Register a callback run with the restaurant ids of each successfully written batch."""
+    _flush_listeners.append(callback)
+
+
+def _pending_counts(restaurant_id: str, meal_date: date) -> Dict[str, dict]:
+    counts: Dict[str, dict] = {}
+    for vote_restaurant, meal_name, rating, vote_date in _pending:
+        if vote_restaurant == restaurant_id and vote_date == meal_date:
+            _apply(counts, meal_name, rating)
+    return counts
+
+
+def _apply(meals: Dict[str, dict], meal_name: str, rating: int):
+    counts = meals.setdefault(meal_name, {'up': 0, 'down': 0, 'score': 0})
+    if rating == 1:
+        counts['up'] += 1
+    else:
+        counts['down'] += 1
+    counts['score'] += rating
+
+
+def _tally(restaurant_id: str, meal_date: date) -> Dict[str, dict]:
+    """Get (re-seeding from the database if stale) the optimistic counts of a restaurant's day."""
+    key = (restaurant_id, meal_date)
+    tally = _tallies.get(key)
+    if tally is not None and time.time() - tally['seeded_at'] < TALLY_TTL_SECONDS:
+        return tally['meals']
+
+    meals = {meal_name: dict(counts) for meal_name, counts in get_ratings_summary(restaurant_id, meal_date).items()}
+    with _lock:
+        # Votes not yet written are missing from the database counts
+        for meal_name, counts in _pending_counts(restaurant_id, meal_date).items():
+            current = meals.setdefault(meal_name, {'up': 0, 'down': 0, 'score': 0})
+            for field in ('up', 'down', 'score'):
+                current[field] += counts[field]
+        _tallies[key] = {'seeded_at': time.time(), 'meals': meals}
+        # Drop tallies of previous days
+        for old_key in [old_key for old_key in _tallies if old_key[1] < meal_date]:
+            del _tallies[old_key]
+    return meals
+
+
+def add(restaurant_id: str, meal_name: str, rating: int, meal_date: Optional[date] = None) -> dict:
+    """
+    Queue a rating and return the meal's optimistic counts including it.
+
+    Returns:
+        {'up': count, 'down': count, 'score': net_score} for the meal
+    """
+    if meal_date is None:
+        meal_date = date.today()
+    rating = int(rating)
+
+    meals = _tally(restaurant_id, meal_date)
+    with _lock:
+        _pending.append((restaurant_id, meal_name, rating, meal_date))
+        _apply(meals, meal_name, rating)
+        counts = dict(meals[meal_name])
+        _stats['accepted'] += 1
+        if len(_pending) >= BATCH_SIZE:
+            _wakeup.set()
+
+    start()
+    return counts
+
+
+def flush() -> bool:
+    """
+    Write every pending vote in one batch.
+    On failure the votes are put back and retried on the next flush.
+    """
+    with _lock:
+        if not _pending:
+            return True
+        batch = list(_pending)
+        del _pending[:]
+
+    import psycopg2
+
+    unwritten = []
+    try:
+        if not add_ratings_batch(batch):
+            unwritten = batch
+    except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+        # A bad row would fail every retry of the batch: write rows one by one
+        # and drop the ones the database rejects
+        print(f"Vote batch rejected ({e}), writing votes individually")
+        unwritten = _write_individually(batch)
+    except Exception as e:
+        print(f"Vote flush error: {e}")
+        unwritten = batch
+
+    if unwritten:
+        with _lock:
+            _pending[:0] = unwritten
+            _stats['flush_errors'] += 1
+        return False
+
+    with _lock:
+        _stats['flushed'] += len(batch)
+        _stats['batches'] += 1
+    restaurant_ids = {vote[0] for vote in batch}
+    for callback in _flush_listeners:
+        try:
+            callback(restaurant_ids)
+        except Exception as e:
+            print(f"Vote flush listener failed: {e}")
+    return True
+
+
+def _write_individually(batch: List[tuple]) -> List[tuple]:
+    """Write votes one at a time; returns the votes left unwritten by a connection error."""
+    import psycopg2
+    for index, vote in enumerate(batch):
+        try:
+            add_rating(*vote)
+        except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+            print(f"Dropping rejected vote {vote}: {e}")
+        except Exception as e:
+            print(f"Vote flush error: {e}")
+            return batch[index:]
+    return []
+
+
+def _run():
+    while not _stop.is_set():
+        _wakeup.wait(FLUSH_INTERVAL_SECONDS)
+        _wakeup.clear()
+        flush()
+
+
+def start():
+    """Start the background flusher thread (no-op if it is already running)."""
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _lock:
+        if _flusher is not None and _flusher.is_alive():
+            return
+        _stop.clear()
+        _flusher = threading.Thread(target=_run, name='vote-flusher', daemon=True)
+        _flusher.start()
+
+
+def stop():
+    """Stop the flusher and write any votes still pending."""
+    global _flusher
+    _stop.set()
+    _wakeup.set()
+    if _flusher is not None:
+        _flusher.join(timeout=FLUSH_INTERVAL_SECONDS + 5)
+        _flusher = None
+    if not flush():
+        print(f"{pending_count()} votes could not be written before shutdown")
+
+
+def pending_votes() -> List[tuple]:
+    """Copy of the votes not yet written, as (restaurant_id, meal_name, rating, meal_date) tuples."""
+    with _lock:
+        return list(_pending)
+
+
+def pending_count() -> int:
+    """Number of votes waiting to be written."""
+    return len(_pending)
+
+
+def stats() -> dict:
+    """Accepted, flushed and failed-flush counters."""
+    with _lock:
+        return dict(_stats, pending=len(_pending))
+
+
+atexit.register(stop)
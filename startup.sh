@@ -7,5 +7,9 @@ cd "$SCRIPT_DIR"
 
 export PORT="${PORT:-8000}"
 
+# Create or migrate the schema once, in its own process, before any worker starts
+flask --app app init-db || echo "Schema setup failed, starting anyway"
+
 echo "Starting Gunicorn from ${SCRIPT_DIR} on port ${PORT}"
-exec gunicorn --bind "0.0.0.0:${PORT}" --timeout 600 --workers 1 app:app
\ No newline at end of file
+# Worker model and cache warm-up live in gunicorn.conf.py
+exec gunicorn --config gunicorn.conf.py app:app
\ No newline at end of file